@@ -0,0 +1,217 @@
+import os
+import gc
+import sys
+import json
+import time
+import shutil
+import zipfile
+import argparse
+import platform
+import resource
+import tempfile
+import posixpath
+import subprocess
+import tracemalloc
+from shell_emulator import VirtualFileSystem, CompactFileSystem
+
+SHAPES = ('wide', 'deep', 'mixed')
+VARIANTS = {
+    'eager': lambda path: VirtualFileSystem(path),
+    'lazy': lambda path: VirtualFileSystem(path, lazy=True),
+    'compact': lambda path: CompactFileSystem(path),
+}
+DEEP_LEVELS = 64
+WARM_REPEATS = 1000
+MOVE_REPEATS = 100
+
+def create_synthetic_zip(path, entries, per_dir):
+    """
+    Создает архив с entries пустыми файлами, разложенными по директориям
+    по per_dir файлов в каждой.
+    """
+    with zipfile.ZipFile(path, 'w') as z:
+        for i in range(entries):
+            z.writestr(f"dir{i // per_dir:05d}/file{i:07d}.txt", b'')
+
+def shape_member(shape, i):
+    """
+    Имя i-го файла синтетического архива заданной формы:
+    wide - все файлы в одной директории, deep - цепочки из DEEP_LEVELS
+    вложенных директорий по 1000 файлов, mixed - двухуровневое дерево 100 x 100.
+    """
+    if shape == 'wide':
+        return f"wide/file{i:07d}.txt"
+    if shape == 'deep':
+        return f"g{i // 1000:04d}/" + "level/" * DEEP_LEVELS + f"file{i:07d}.txt"
+    return f"d{i % 100:02d}/s{i // 100 % 100:02d}/file{i:07d}.txt"
+
+def create_shape_zip(path, shape, entries):
+    """
+    Создает синтетический архив формы shape с entries файлами.
+    """
+    with zipfile.ZipFile(path, 'w') as z:
+        for i in range(entries):
+            z.writestr(shape_member(shape, i), b'x' * (i % 64))
+
+def measure_memory(factory, zip_path):
+    """
+    Возвращает (байты, секунды): память, занятую построенной ФС, и время построения.
+    Время замеряется отдельным запуском, так как tracemalloc сильно замедляет код.
+    """
+    gc.collect()
+    start = time.perf_counter()
+    vfs = factory(zip_path)
+    elapsed = time.perf_counter() - start
+    del vfs
+    gc.collect()
+    tracemalloc.start()
+    vfs = factory(zip_path)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del vfs
+    return current, elapsed
+
+def run_memory_benchmark(entries, per_dir):
+    # Ленивая загрузка без обращений держит только индекс центрального каталога,
+    # поэтому её память - база, относительно которой считается цена дерева
+    variants = [
+        ("ленивая загрузка", lambda path: VirtualFileSystem(path, lazy=True)),
+        ("dict-дерево", lambda path: VirtualFileSystem(path)),
+        ("таблица узлов", lambda path: CompactFileSystem(path)),
+    ]
+    fd, zip_path = tempfile.mkstemp(suffix='.zip')
+    os.close(fd)
+    try:
+        create_synthetic_zip(zip_path, entries, per_dir)
+        print(f"Элементов в архиве: {entries}, файлов в директории: {per_dir}")
+        baseline = None
+        for name, factory in variants:
+            memory, elapsed = measure_memory(factory, zip_path)
+            if baseline is None:
+                baseline = memory
+            print(f"{name:>18}: {memory / entries:7.1f} байт/элемент всего, "
+                  f"{(memory - baseline) / entries:7.1f} на дерево, "
+                  f"{memory / 2**20:8.1f} МиБ, построение {elapsed:6.2f} с")
+    finally:
+        os.unlink(zip_path)
+
+def timed(func, repeats=1):
+    """
+    Среднее время одного вызова func в секундах.
+    """
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) / repeats
+
+def run_case(shape, entries, variant, fixture):
+    """
+    Замеры одной комбинации формы, размера и представления дерева.
+    Выполняется в отдельном процессе, чтобы пиковый RSS относился только к ней.
+    """
+    work_dir = tempfile.mkdtemp()
+    zip_path = os.path.join(work_dir, 'image.zip')
+    shutil.copyfile(fixture, zip_path)
+    try:
+        start = time.perf_counter()
+        vfs = VARIANTS[variant](zip_path)
+        build = time.perf_counter() - start
+
+        member = '/' + shape_member(shape, entries - 1)
+        target_dir = posixpath.dirname(member)
+        listed_dir = posixpath.dirname('/' + shape_member(shape, 0))
+        navigate_cold = timed(lambda: vfs.navigate(target_dir))
+        navigate_warm = timed(lambda: vfs.navigate(target_dir), WARM_REPEATS)
+        list_dir = timed(lambda: vfs.list_dir(listed_dir))
+
+        def move_there_and_back():
+            vfs.move(member, '/moved.txt', '/')
+            vfs.move('/moved.txt', member, '/')
+        move = timed(move_there_and_back, MOVE_REPEATS) / 2
+
+        # Сохранение после одного перемещения: журнал сбрасывается, так как
+        # перемещения туда и обратно вернули дерево в исходное состояние
+        vfs.journal = []
+        vfs.move(member, '/moved.txt', '/')
+        save = timed(vfs.save_zip)
+        vfs.close()
+
+        return {
+            'shape': shape,
+            'entries': entries,
+            'variant': variant,
+            'build_s': build,
+            'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            'navigate_cold_us': navigate_cold * 1e6,
+            'navigate_warm_us': navigate_warm * 1e6,
+            'list_dir_ms': list_dir * 1e3,
+            'move_us': move * 1e6,
+            'save_zip_s': save,
+        }
+    finally:
+        shutil.rmtree(work_dir)
+
+def run_suite(sizes, shapes, variants, output):
+    work_dir = tempfile.mkdtemp()
+    results = []
+    try:
+        for shape in shapes:
+            for entries in sizes:
+                # Архив тоже создаётся в отдельном процессе: Linux наследует пиковый
+                # RSS родителя при fork, и замеры не должны включать генерацию
+                fixture = os.path.join(work_dir, f'{shape}-{entries}.zip')
+                subprocess.run([sys.executable, os.path.abspath(__file__), '--create', shape, str(entries), fixture],
+                               check=True)
+                for variant in variants:
+                    process = subprocess.run(
+                        [sys.executable, os.path.abspath(__file__), '--case', shape, str(entries), variant, fixture],
+                        stdout=subprocess.PIPE, text=True, check=True)
+                    result = json.loads(process.stdout)
+                    results.append(result)
+                    print(f"{shape:>6} {entries:>8} {variant:>8}: построение {result['build_s']:.3f} с, "
+                          f"RSS {result['peak_rss_kb'] / 1024:.1f} МиБ, сохранение {result['save_zip_s']:.3f} с",
+                          file=sys.stderr)
+                os.unlink(fixture)
+    finally:
+        shutil.rmtree(work_dir)
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарки загрузки и команд виртуальной файловой системы.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000],
+                        help='Числа элементов синтетических архивов.')
+    parser.add_argument('--shapes', nargs='+', choices=SHAPES, default=list(SHAPES), help='Формы деревьев.')
+    parser.add_argument('--variants', nargs='+', choices=list(VARIANTS), default=list(VARIANTS),
+                        help='Представления дерева.')
+    parser.add_argument('--output', help='Файл для результатов в формате JSON (по умолчанию stdout).')
+    parser.add_argument('--memory', action='store_true',
+                        help='Вместо набора замеров посчитать память на элемент (см. --entries, --per-dir).')
+    parser.add_argument('--entries', type=int, default=1_000_000, help='Число элементов для --memory.')
+    parser.add_argument('--per-dir', type=int, default=1000, help='Число файлов в одной директории для --memory.')
+    parser.add_argument('--case', nargs=4, metavar=('SHAPE', 'ENTRIES', 'VARIANT', 'ZIP'), help=argparse.SUPPRESS)
+    parser.add_argument('--create', nargs=3, metavar=('SHAPE', 'ENTRIES', 'ZIP'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.create:
+        shape, entries, fixture = args.create
+        create_shape_zip(fixture, shape, int(entries))
+    elif args.case:
+        shape, entries, variant, fixture = args.case
+        print(json.dumps(run_case(shape, int(entries), variant, fixture)))
+    elif args.memory:
+        run_memory_benchmark(args.entries, args.per_dir)
+    else:
+        run_suite(args.sizes, args.shapes, args.variants, args.output)
+
+if __name__ == "__main__":
+    main()
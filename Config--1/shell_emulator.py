@@ -1,92 +1,626 @@
+import os
+import io
 import sys
+import copy
+import time
+import mmap
+import zlib
+import bisect
+import fnmatch
+import signal
+import struct
 import zipfile
+import asyncio
 import argparse
 import posixpath
+from array import array
+from collections import OrderedDict
+
+COPY_CHUNK_SIZE = 1 << 20
+PATH_CACHE_SIZE = 4096
+LIST_PAGE_SIZE = 1000
+# Директории CompactFileSystem с большим числом потомков получают индекс имя -> узел
+CHILD_INDEX_MIN = 32
+
+def has_magic(pattern):
+    return any(char in pattern for char in '*?[')
+
+def strip_zip64_extra(extra):
+    # Убирает поле ZIP64 (id 0x0001) из extra: zipfile добавит его сам, если понадобится
+    result = b''
+    while len(extra) >= 4:
+        tp, ln = struct.unpack('<HH', extra[:4])
+        if tp != 1:
+            result += extra[:4 + ln]
+        extra = extra[4 + ln:]
+    return result
+
+def copy_member(src, info, dst, name):
+    # Копирует элемент архива src в архив dst под именем name без распаковки:
+    # сжатые данные переносятся как есть, заново пишется только локальный заголовок.
+    # src и dst могут быть одним архивом, открытым в режиме 'a'
+    src.fp.seek(info.header_offset)
+    header = struct.unpack(zipfile.structFileHeader, src.fp.read(zipfile.sizeFileHeader))
+    read_pos = info.header_offset + zipfile.sizeFileHeader + header[10] + header[11]
+
+    new_info = copy.copy(info)
+    new_info.filename = new_info.orig_filename = name
+    new_info.flag_bits &= ~0x08  # размеры и CRC известны, дескриптор данных не нужен
+    new_info.extra = strip_zip64_extra(info.extra)
+    new_info.header_offset = dst.start_dir
+    zip64 = info.file_size > zipfile.ZIP64_LIMIT or info.compress_size > zipfile.ZIP64_LIMIT
+
+    dst.fp.seek(dst.start_dir)
+    dst.fp.write(new_info.FileHeader(zip64))
+    write_pos = dst.fp.tell()
+    remaining = info.compress_size
+    while remaining:
+        src.fp.seek(read_pos)
+        chunk = src.fp.read(min(COPY_CHUNK_SIZE, remaining))
+        if not chunk:
+            raise zipfile.BadZipFile(f"Неожиданный конец данных элемента {info.filename}")
+        dst.fp.seek(write_pos)
+        dst.fp.write(chunk)
+        read_pos += len(chunk)
+        write_pos += len(chunk)
+        remaining -= len(chunk)
+
+    dst.start_dir = write_pos
+    dst._didModify = True  # иначе при закрытии не будет записан центральный каталог
+    dst.filelist.append(new_info)
+    dst.NameToInfo[name] = new_info
+    return new_info
+
+class LazyDir(dict):
+    # Директория, содержимое которой ещё не прочитано из индекса архива.
+    # prefix - путь директории внутри архива ('' для корня), None после развёртывания
+    __slots__ = ('prefix',)
+
+    def __init__(self, prefix):
+        super().__init__()
+        self.prefix = prefix
 
 class VirtualFileSystem:
-    def __init__(self, zip_path):
+    def __init__(self, zip_path, lazy=False):
         self.zip_path = zip_path
+        self.lazy = lazy
         self.fs = {}
+        self.index = []
+        self.mapping = None
+        # Кэш разрешённых путей: нормализованный абсолютный путь -> узел директории
+        self.path_cache = OrderedDict()
+        # Отсортированные имена потомков уже просмотренных директорий
+        self.listings = {}
+        # Журнал изменений сессии: ('mv', откуда, куда) и ('add', путь, None)
+        self.journal = []
         self.load_zip()
 
     def load_zip(self):
         with zipfile.ZipFile(self.zip_path, 'r') as z:
-            for file in z.namelist():
-                self.add_path(file)
-
-    def add_path(self, path):
-        parts = path.strip('/').split('/')
-        current = self.fs
-        for part in parts:
-            if part not in current:
-                current[part] = {}
-            current = current[part]
-
-    def save_zip(self):
-        with zipfile.ZipFile(self.zip_path, 'w') as z:
-            self.write_fs(z, self.fs, "")
-
-    def write_fs(self, z, current, path):
-        for name, content in current.items():
-            current_path = posixpath.join(path, name)
-            if isinstance(content, dict):
-                # Добавляем директорию (заканчивается слешем)
-                z.writestr(current_path + '/', '')
-                self.write_fs(z, content, current_path)
+            infos = z.infolist()
+        self.build_index(infos)
+        self.path_cache.clear()
+        self.listings = {}
+        if self.lazy:
+            # Читаем только центральный каталог, дерево строится
+            # по мере обращения к директориям
+            self.fs = LazyDir('')
+            return
+        for info in infos:
+            self.add_path(info.filename, source=info.filename)
+
+    def build_index(self, infos):
+        # Индекс центрального каталога: отсортированные пути элементов и
+        # параллельные массивы смещений заголовков, размеров и методов сжатия
+        infos = sorted(infos, key=lambda info: info.filename.lstrip('/'))
+        self.index = [info.filename.lstrip('/') for info in infos]
+        self.offsets = array('Q', (info.header_offset for info in infos))
+        self.compressed_sizes = array('Q', (info.compress_size for info in infos))
+        self.sizes = array('Q', (info.file_size for info in infos))
+        self.methods = array('B', (info.compress_type for info in infos))
+
+    def member(self, name):
+        # Позиция элемента архива в индексе или None
+        name = name.lstrip('/')
+        i = bisect.bisect_left(self.index, name)
+        if i < len(self.index) and self.index[i] == name:
+            return i
+        return None
+
+    def expand(self, node):
+        # Разворачивает ленивую директорию: добавляет непосредственных потомков
+        # из индекса, пропуская содержимое поддиректорий через bisect
+        prefix = getattr(node, 'prefix', None)
+        if prefix is None:
+            return node
+        node.prefix = None
+        index = self.index
+        i = bisect.bisect_left(index, prefix)
+        while i < len(index) and index[i].startswith(prefix):
+            name, sep, _ = index[i][len(prefix):].partition('/')
+            if not name:
+                i += 1
+            elif sep:
+                node[name] = LazyDir(prefix + name + '/')
+                # '0' следует сразу за '/', поэтому так пропускаем всё поддерево
+                i = bisect.bisect_left(index, prefix + name + '0', i)
             else:
-                # Добавляем файл
-                z.writestr(current_path, content)
+                # Файл хранит имя своего элемента в архиве
+                node.setdefault(name, index[i])
+                i += 1
+        return node
+
+    def add_path(self, path, source=None):
+        # Файл - это строка с именем элемента архива (source) либо bytes с
+        # содержимым нового файла; новые пути записываются в журнал
+        parts = [part for part in path.split('/') if part]
+        is_dir = path.endswith('/')
+        created = False
+        current = self.expand(self.fs)
+        for i, part in enumerate(parts):
+            child = current.get(part)
+            if i == len(parts) - 1 and not is_dir:
+                if child is None:
+                    current[part] = source if source is not None else b''
+                    self.listing_add(current, part)
+                    created = True
+            else:
+                if not isinstance(child, dict):
+                    if child is None:
+                        self.listing_add(current, part)
+                    current[part] = child = {}
+                    created = True
+                current = self.expand(child)
+        if created and source is None:
+            self.journal.append(('add', path.lstrip('/'), None))
+
+    def replay(self, name, start=0):
+        # Применяет к имени элемента архива перемещения из журнала, начиная с позиции start
+        path = name.strip('/')
+        for op, src, dest in self.journal[start:]:
+            if op == 'mv' and (path == src or path.startswith(src + '/')):
+                path = dest + path[len(src):]
+        return path + '/' if name.endswith('/') else path
+
+    def locate(self, path):
+        # Возвращает (родительская директория, имя) для файла или директории по пути
+        parent = self.navigate(posixpath.dirname('/' + path.strip('/')))
+        name = posixpath.basename(path.strip('/'))
+        if parent is None or name not in parent:
+            return None
+        return parent, name
+
+    def save_zip(self, compact=False):
+        # Сохраняет только изменения сессии. По умолчанию архив дописывается на месте:
+        # переименованные элементы копируются в конец без перепаковки, после чего
+        # перезаписывается центральный каталог. compact=True переписывает архив
+        # целиком (тоже копированием сжатых данных), убирая устаревшие заголовки
+        if not self.journal:
+            return
+        self.close()
+        if compact:
+            tmp_path = self.zip_path + '.tmp'
+            with zipfile.ZipFile(self.zip_path, 'r') as src, zipfile.ZipFile(tmp_path, 'w') as dst:
+                for info in src.infolist():
+                    copy_member(src, info, dst, self.replay(info.filename))
+                self.write_added(dst)
+                infos = dst.filelist
+            os.replace(tmp_path, self.zip_path)
+        else:
+            with zipfile.ZipFile(self.zip_path, 'a') as z:
+                moved = []
+                kept = []
+                for info in z.filelist:
+                    name = self.replay(info.filename)
+                    if name == info.filename:
+                        kept.append(info)
+                    else:
+                        moved.append((info, name))
+                        del z.NameToInfo[info.filename]
+                z.filelist = kept
+                for info, name in moved:
+                    copy_member(z, info, z, name)
+                self.write_added(z)
+                infos = z.filelist
+        self.rebase()
+        self.journal = []
+        self.build_index(infos)
+
+    def write_added(self, z):
+        # Записывает созданные в сессии файлы и директории
+        names = set(z.NameToInfo)
+        for position, (op, path, _) in enumerate(self.journal):
+            if op != 'add':
+                continue
+            name = self.replay(path, position + 1).rstrip('/')
+            content = self.file_node(name)
+            if content is None:
+                if self.navigate('/' + name) is None:
+                    continue
+                name += '/'
+                content = ''
+            elif not isinstance(content, bytes):
+                continue
+            if name not in names:
+                z.writestr(name, content)
+                names.add(name)
+        # Директория без своего элемента в архиве существует только через имена
+        # потомков: если mv её опустошил, записываем для неё элемент 'dir/'
+        for position, (op, src, _) in enumerate(self.journal):
+            parent = posixpath.dirname(src)
+            if op != 'mv' or not parent:
+                continue
+            name = self.replay(parent, position + 1)
+            node = self.navigate('/' + name)
+            if node is None or next(self.iter_children(node), None) is not None:
+                continue
+            if name + '/' not in names:
+                z.writestr(name + '/', '')
+                names.add(name + '/')
+
+    def rebase(self):
+        # После сохранения переводит ссылки перемещённых и новых узлов на их новые
+        # имена в архиве; обходятся только затронутые поддеревья
+        targets = set()
+        for position, (op, path, dest) in enumerate(self.journal):
+            targets.add(self.replay(dest if op == 'mv' else path, position + 1).strip('/'))
+            if op == 'mv':
+                self.invalidate('/' + path)
+        for target in targets:
+            self.invalidate('/' + target)
+            found = self.locate(target)
+            if found is None:
+                continue
+            stack = [(found[0], found[1], target)]
+            while stack:
+                parent, name, path = stack.pop()
+                node = parent[name]
+                if isinstance(node, dict):
+                    if getattr(node, 'prefix', None) is not None:
+                        node.prefix = path + '/'
+                    else:
+                        stack.extend((node, child, path + '/' + child) for child in node)
+                else:
+                    parent[name] = path
+
+    def close(self):
+        # Освобождает отображение архива в память. Если снаружи ещё живут
+        # memoryview на него, отображение закроется вместе с последним из них
+        if self.mapping is not None:
+            try:
+                self.mapping.close()
+            except BufferError:
+                pass
+            self.mapping = None
+
+    def file_node(self, path):
+        # Узел файла по пути: имя элемента архива или bytes, None для директорий
+        found = self.locate(path)
+        if found is None:
+            return None
+        node = found[0][found[1]]
+        return None if isinstance(node, dict) else node
+
+    def member_data(self, i):
+        # Смещение сжатых данных элемента в архиве по локальному заголовку
+        if self.mapping is None:
+            with open(self.zip_path, 'rb') as f:
+                self.mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        offset = self.offsets[i]
+        name_length, extra_length = struct.unpack_from('<HH', self.mapping, offset + 26)
+        return offset + zipfile.sizeFileHeader + name_length + extra_length
+
+    def read_file(self, path):
+        # Содержимое файла как memoryview. Несжатые элементы отдаются срезом
+        # отображения архива без копирования, сжатые распаковываются целиком
+        node = self.file_node(path)
+        if node is None:
+            return None
+        if isinstance(node, bytes):
+            return memoryview(node)
+        i = self.member(node)
+        if i is None:
+            return None
+        if self.methods[i] == zipfile.ZIP_STORED:
+            start = self.member_data(i)
+            return memoryview(self.mapping)[start:start + self.sizes[i]]
+        return memoryview(b''.join(self.iter_file(path)))
+
+    def iter_file(self, path, chunk_size=COPY_CHUNK_SIZE):
+        # Потоковое чтение файла кусками не длиннее chunk_size
+        node = self.file_node(path)
+        if node is None:
+            return None
+        if isinstance(node, bytes):
+            return iter([memoryview(node)] if node else [])
+        i = self.member(node)
+        if i is None:
+            return None
+        if self.methods[i] == zipfile.ZIP_STORED:
+            return self.iter_stored(i, chunk_size)
+        if self.methods[i] == zipfile.ZIP_DEFLATED:
+            return self.iter_deflated(i, chunk_size)
+        return self.iter_zipfile(node, chunk_size)
+
+    def iter_stored(self, i, chunk_size):
+        start = self.member_data(i)
+        end = start + self.sizes[i]
+        view = memoryview(self.mapping)
+        for pos in range(start, end, chunk_size):
+            yield view[pos:min(pos + chunk_size, end)]
+
+    def iter_deflated(self, i, chunk_size):
+        # Распаковка с ограничением max_length: в памяти не больше chunk_size
+        # распакованных байт и одного куска сжатых
+        pos = self.member_data(i)
+        end = pos + self.compressed_sizes[i]
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        with memoryview(self.mapping) as view:
+            while not decompressor.eof:
+                if decompressor.unconsumed_tail:
+                    data = decompressor.unconsumed_tail
+                elif pos < end:
+                    data = view[pos:min(pos + chunk_size, end)]
+                    pos += len(data)
+                else:
+                    break
+                chunk = decompressor.decompress(data, chunk_size)
+                if chunk:
+                    yield chunk
+        chunk = decompressor.flush()
+        if chunk:
+            yield chunk
 
-    def list_dir(self, path):
+    def iter_zipfile(self, name, chunk_size):
+        # Остальные методы сжатия (bzip2, lzma) читаем средствами zipfile
+        with zipfile.ZipFile(self.zip_path, 'r') as z, z.open(name) as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def node_key(self, node):
+        return id(node)
+
+    def child_names(self, node):
+        return node.keys()
+
+    def listing(self, node):
+        # Сортировка делается один раз при первом просмотре директории,
+        # дальше список поддерживается вставками и удалениями через bisect
+        entry = self.listings.get(self.node_key(node))
+        if entry is None:
+            # Узел хранится рядом со списком, чтобы его id не переиспользовался
+            entry = self.listings[self.node_key(node)] = (node, sorted(self.child_names(node)))
+        return entry[1]
+
+    def listing_add(self, node, name):
+        entry = self.listings.get(self.node_key(node))
+        if entry is not None:
+            bisect.insort(entry[1], name)
+
+    def listing_remove(self, node, name):
+        entry = self.listings.get(self.node_key(node))
+        if entry is not None:
+            names = entry[1]
+            i = bisect.bisect_left(names, name)
+            if i < len(names) and names[i] == name:
+                del names[i]
+
+    def list_dir(self, path, offset=0, limit=None):
         dir = self.navigate(path)
         if dir is None:
             return None
-        return sorted(dir.keys())
+        names = self.listing(dir)
+        return names[offset:] if limit is None else names[offset:offset + limit]
+
+    def iter_dir(self, path, offset=0, limit=None, page_size=LIST_PAGE_SIZE):
+        # Постраничный листинг: страницы отдаются по мере вывода,
+        # без копирования всего списка имён
+        dir = self.navigate(path)
+        if dir is None:
+            return None
+        return self.iter_pages(self.listing(dir), offset, limit, page_size)
+
+    def iter_pages(self, names, offset, limit, page_size):
+        end = len(names) if limit is None else min(len(names), offset + limit)
+        for start in range(offset, end, page_size):
+            yield names[start:min(start + page_size, end)]
+
+    def abspath(self, path, cwd='/'):
+        # Нормализованный абсолютный путь: '.' и '..' разбираются лексически,
+        # выше корня подняться нельзя
+        path = posixpath.normpath(posixpath.join('/', cwd, path))
+        return '/' + path.lstrip('/')
+
+    def root_node(self):
+        return self.expand(self.fs)
+
+    def child_dir(self, node, name):
+        # Поддиректория с именем name или None
+        child = node.get(name)
+        if isinstance(child, dict):
+            return self.expand(child)
+        return None
 
     def navigate(self, path):
-        if path.startswith('/'):
-            parts = path.strip('/').split('/')
-            current = self.fs
-        else:
-            parts = path.split('/')
-            current = self.fs
-        for part in parts:
-            if part == '..':
-                # Для простоты не реализуем переход вверх
+        key = self.abspath(path)
+        cache = self.path_cache
+        node = cache.get(key)
+        if node is not None:
+            cache.move_to_end(key)
+            return node
+        # Поднимаемся до ближайшего закэшированного предка и спускаемся
+        # от него, запоминая каждую пройденную директорию
+        names = []
+        ancestor = key
+        while ancestor != '/' and ancestor not in cache:
+            ancestor, name = posixpath.split(ancestor)
+            names.append(name)
+        node = self.root_node() if ancestor == '/' else cache[ancestor]
+        path = ancestor.rstrip('/')
+        for name in reversed(names):
+            node = self.child_dir(node, name)
+            if node is None:
                 return None
-            elif part == '.' or part == '':
-                continue
-            elif part in current and isinstance(current[part], dict):
-                current = current[part]
-            else:
+            path += '/' + name
+            cache[path] = node
+            if len(cache) > PATH_CACHE_SIZE:
+                cache.popitem(last=False)
+        return node
+
+    def invalidate(self, path):
+        # Убирает из кэша путь и всё его поддерево
+        prefix = path.rstrip('/') + '/'
+        for key in [key for key in self.path_cache if key == path or key.startswith(prefix)]:
+            del self.path_cache[key]
+
+    def iter_children(self, node):
+        # (имя, узел, директория ли) для потомков директории
+        for name, child in self.expand(node).items():
+            yield name, child, isinstance(child, dict)
+
+    def node_size(self, node):
+        # Размер файла из центрального каталога (или длина содержимого нового файла)
+        if isinstance(node, bytes):
+            return len(node)
+        i = self.member(node)
+        return self.sizes[i] if i is not None else 0
+
+    def walk(self, path):
+        # Итеративный обход поддерева в глубину: (путь, глубина, директория ли, размер).
+        # None, если пути нет; для файла - единственная запись о нём
+        path = self.abspath(path)
+        node = self.navigate(path)
+        if node is None:
+            node = self.file_node(path)
+            if node is None:
                 return None
-        return current
+            return iter([(path, 0, False, self.node_size(node))])
+        return self.iter_walk(path, node)
 
-    def move(self, src, dest, cwd):
-        # Определяем абсолютные пути
-        src_path = posixpath.join(cwd, src) if not posixpath.isabs(src) else src
-        dest_path = posixpath.join(cwd, dest) if not posixpath.isabs(dest) else dest
+    def iter_walk(self, path, node):
+        stack = [(path, 0, node)]
+        while stack:
+            path, depth, node = stack.pop()
+            yield path, depth, True, 0
+            prefix = path.rstrip('/') + '/'
+            subdirs = []
+            for name, child, is_dir in self.iter_children(node):
+                if is_dir:
+                    subdirs.append((prefix + name, depth + 1, child))
+                else:
+                    yield prefix + name, depth + 1, False, self.node_size(child)
+            stack.extend(reversed(subdirs))
 
-        # Нормализуем пути
-        src_path = posixpath.normpath(src_path)
-        dest_path = posixpath.normpath(dest_path)
+    def find(self, path, name=None, type=None):
+        # Пути поддерева, подходящие под шаблон имени и тип ('f' или 'd')
+        entries = self.walk(path)
+        if entries is None:
+            return None
+        return (entry_path for entry_path, _, is_dir, _ in entries
+                if (type is None or type == ('d' if is_dir else 'f'))
+                and (name is None or fnmatch.fnmatchcase(posixpath.basename(entry_path) or '/', name)))
+
+    def disk_usage(self, path):
+        # Суммарные размеры директорий поддерева за один проход обхода:
+        # (путь, байт) в порядке выхода из директорий, последняя запись - сам путь
+        entries = self.walk(path)
+        if entries is None:
+            return None
+        return self.iter_usage(entries)
+
+    def iter_usage(self, entries):
+        open_dirs = []  # [путь, глубина, сумма] для директорий текущей ветви
+        for path, depth, is_dir, size in entries:
+            while open_dirs and open_dirs[-1][1] >= depth:
+                done_path, _, total = open_dirs.pop()
+                yield done_path, total
+                open_dirs[-1][2] += total
+            if is_dir:
+                open_dirs.append([path, depth, 0])
+            elif open_dirs:
+                open_dirs[-1][2] += size
+            else:
+                yield path, size
+        while open_dirs:
+            done_path, _, total = open_dirs.pop()
+            yield done_path, total
+            if open_dirs:
+                open_dirs[-1][2] += total
+
+    def glob(self, pattern, cwd='/'):
+        # Существующие пути, подходящие под шаблон с * ? [...] в любых компонентах
+        parts = [part for part in self.abspath(pattern, cwd).split('/') if part]
+        matches = ['/']
+        for i, part in enumerate(parts):
+            last = i == len(parts) - 1
+            found = []
+            for base in matches:
+                prefix = base.rstrip('/') + '/'
+                if has_magic(part):
+                    node = self.navigate(base)
+                    names = fnmatch.filter(self.listing(node), part) if node is not None else []
+                else:
+                    names = [part]
+                for name in names:
+                    path = prefix + name
+                    if self.navigate(path) is not None or (last and self.file_node(path) is not None):
+                        found.append(path)
+            matches = found
+        return matches
+
+    def move_many(self, sources, dest, cwd):
+        # Перемещение нескольких источников (в том числе шаблонов) в директорию dest.
+        # Возвращает источники, которые переместить не удалось
+        paths = []
+        failed = []
+        for src in sources:
+            if has_magic(src):
+                matches = self.glob(src, cwd)
+                paths.extend(matches)
+                if not matches:
+                    failed.append(src)
+            else:
+                paths.append(src)
+        if len(paths) > 1 and self.navigate(self.abspath(dest, cwd)) is None:
+            return failed + paths  # Несколько источников можно переместить только в директорию
+        for src in paths:
+            if not self.move(src, dest, cwd):
+                failed.append(src)
+        return failed
+
+    def move(self, src, dest, cwd):
+        # Определяем нормализованные абсолютные пути
+        src_path = self.abspath(src, cwd)
+        dest_path = self.abspath(dest, cwd)
 
         src_parts = src_path.strip('/').split('/')
         dest_parts = dest_path.strip('/').split('/')
+        if dest_path == src_path or dest_path.startswith(src_path.rstrip('/') + '/'):
+            return False  # Директорию нельзя переместить в себя или в своё поддерево
 
         # Находим родительскую директорию источника
-        src_parent = self.fs
-        for part in src_parts[:-1]:
-            if part in src_parent and isinstance(src_parent[part], dict):
-                src_parent = src_parent[part]
-            else:
-                return False  # Источник не найден
+        src_parent = self.navigate(posixpath.dirname(src_path))
+        if src_parent is None:
+            return False  # Источник не найден
 
         # Извлекаем элемент для перемещения
         item = src_parent.pop(src_parts[-1], None)
         if item is None:
             return False  # Элемент для перемещения не найден
+        self.listing_remove(src_parent, src_parts[-1])
+
+        if self.attach(item, src_parts, dest_path, dest_parts):
+            self.invalidate(src_path)
+            return True
+        # Возвращаем элемент на место, если переместить не удалось
+        src_parent[src_parts[-1]] = item
+        self.listing_add(src_parent, src_parts[-1])
+        return False
 
+    def attach(self, item, src_parts, dest_path, dest_parts):
         # Определяем, является ли назначение существующей директорией
         dest_dir = self.navigate(dest_path)
         if dest_dir is not None and isinstance(dest_dir, dict):
@@ -95,103 +629,683 @@ class VirtualFileSystem:
                 # Имя уже существует в целевой директории
                 return False
             dest_dir[src_parts[-1]] = item
+            self.listing_add(dest_dir, src_parts[-1])
+            dest_parts = dest_parts + [src_parts[-1]]
         else:
             # Переименование или перемещение с новым именем
-            dest_parent = self.fs
+            dest_parent = self.expand(self.fs)
             for part in dest_parts[:-1]:
                 if part not in dest_parent:
                     dest_parent[part] = {}
+                    self.listing_add(dest_parent, part)
                 elif not isinstance(dest_parent[part], dict):
                     return False  # Некорректный путь назначения
-                dest_parent = dest_parent[part]
+                dest_parent = self.expand(dest_parent[part])
             if dest_parts[-1] in dest_parent:
                 # Имя уже существует в целевой директории
                 return False
             dest_parent[dest_parts[-1]] = item
+            self.listing_add(dest_parent, dest_parts[-1])
 
+        self.journal.append(('mv', '/'.join(src_parts), '/'.join(part for part in dest_parts if part)))
         return True
 
-def parse_args():
-    parser = argparse.ArgumentParser(description='Эмулятор оболочки ОС с виртуальной файловой системой.')
-    parser.add_argument('username', help='Имя пользователя для приглашения к вводу.')
-    parser.add_argument('zip_path', help='Путь к архиву виртуальной файловой системы (zip).')
-    return parser.parse_args()
+class CompactFileSystem(VirtualFileSystem):
+    # Дерево в виде таблицы узлов: параллельные массивы вместо словаря на
+    # каждую директорию и файл. Узел - целое число (0 - корень). Имя файла из
+    # архива не хранится отдельно, а берётся из пути элемента в индексе
+    DIR = 1
 
-def main():
-    args = parse_args()
-    username = args.username
-    zip_path = args.zip_path
+    def load_zip(self):
+        with zipfile.ZipFile(self.zip_path, 'r') as z:
+            infos = z.infolist()
+        self.build_index(infos)
+        self.build_table()
 
-    if not zip_path.endswith('.zip'):
-        print(f"Ошибка: Файл {zip_path} не является zip-архивом.")
-        sys.exit(1)
+    def build_table(self):
+        self.path_cache.clear()
+        self.listings = {}
+        self.names = []       # интернированные имена директорий и переименованных узлов
+        self.name_ids = {}
+        self.name = array('l')          # id имени или -1: имя из пути элемента архива
+        self.parent = array('l')
+        self.first_child = array('l')
+        self.next_sibling = array('l')
+        self.prev_sibling = array('l')
+        self.child_index = {}           # директория -> {имя: узел}, строится при первом поиске
+        self.flags = array('B')
+        self.member_of = array('l')     # позиция элемента в индексе или -1
+        self.contents = {}              # содержимое новых файлов: узел -> bytes
+        self.new_node(-1, '', self.DIR)
 
-    try:
-        vfs = VirtualFileSystem(zip_path)
-    except zipfile.BadZipFile:
-        print(f"Ошибка: Файл {zip_path} не является корректным zip-архивом.")
-        sys.exit(1)
+        # Индекс отсортирован, поэтому содержимое каждой директории идёт подряд
+        # и достаточно держать стек директорий текущего пути. Директории, в
+        # которых набралось CHILD_INDEX_MIN потомков, сразу получают индекс имён
+        stack = [0]
+        stack_names = []
+        counts = [0]
+        for i, path in enumerate(self.index):
+            parts = [part for part in path.split('/') if part]
+            if not parts:
+                continue
+            is_dir = path.endswith('/')
+            dir_parts = parts if is_dir else parts[:-1]
+            depth = 0
+            while depth < len(stack_names) and depth < len(dir_parts) and stack_names[depth] == dir_parts[depth]:
+                depth += 1
+            del stack[depth + 1:]
+            del stack_names[depth:]
+            del counts[depth + 1:]
+            for part in dir_parts[depth:]:
+                parent = stack[-1]
+                last = self.first_child[parent]
+                if last != -1 and self.node_name(last) == part:
+                    # Файл и директория с одним именем: узел становится директорией
+                    node = last
+                    self.flags[node] |= self.DIR
+                else:
+                    node = self.new_node(parent, part, self.DIR)
+                    self.count_child(stack, counts)
+                stack.append(node)
+                stack_names.append(part)
+                counts.append(0)
+            if not is_dir:
+                self.new_node(stack[-1], None, 0, i)
+                self.count_child(stack, counts)
 
-    cwd = '/'
+    def count_child(self, stack, counts):
+        counts[-1] += 1
+        if counts[-1] == CHILD_INDEX_MIN:
+            self.children_index(stack[-1])
 
-    while True:
-        prompt = f"{username}@emulator:{cwd}$ "
+    def intern(self, name):
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            name_id = self.name_ids[name] = len(self.names)
+            self.names.append(name)
+        return name_id
+
+    def new_node(self, parent, name, flags, member=-1):
+        # Новый узел добавляется в начало списка потомков родителя
+        node = len(self.parent)
+        self.name.append(-1 if name is None else self.intern(name))
+        self.parent.append(parent)
+        self.first_child.append(-1)
+        self.next_sibling.append(-1)
+        self.prev_sibling.append(-1)
+        self.flags.append(flags)
+        self.member_of.append(member)
+        if parent >= 0:
+            self.link_first(parent, node, self.node_name(node))
+        return node
+
+    def node_name(self, node):
+        name_id = self.name[node]
+        if name_id >= 0:
+            return self.names[name_id]
+        path = self.index[self.member_of[node]].rstrip('/')
+        return path[path.rfind('/') + 1:]
+
+    def is_dir(self, node):
+        return bool(self.flags[node] & self.DIR)
+
+    def iter_children(self, node):
+        for child in self.children(node):
+            yield self.node_name(child), child, self.is_dir(child)
+
+    def node_size(self, node):
+        if self.member_of[node] >= 0:
+            return self.sizes[self.member_of[node]]
+        return len(self.contents.get(node, b''))
+
+    def children(self, node):
+        child = self.first_child[node]
+        while child != -1:
+            yield child
+            child = self.next_sibling[child]
+
+    def children_index(self, node):
+        # Индекс имя -> узел для директории; поддерживается при связывании и отвязывании
+        index = self.child_index.get(node)
+        if index is None:
+            index = self.child_index[node] = {self.node_name(child): child for child in self.children(node)}
+        return index
+
+    def child(self, node, name):
+        # Небольшие директории просматриваются по списку, для больших строится индекс
+        index = self.child_index.get(node)
+        if index is not None:
+            return index.get(name)
+        for count, child in enumerate(self.children(node)):
+            if count == CHILD_INDEX_MIN:
+                return self.children_index(node).get(name)
+            if self.node_name(child) == name:
+                return child
+        return None
+
+    def link_first(self, parent, node, name):
+        # Вставляет узел в начало списка потомков родителя
+        first = self.first_child[parent]
+        self.next_sibling[node] = first
+        self.prev_sibling[node] = -1
+        if first != -1:
+            self.prev_sibling[first] = node
+        self.first_child[parent] = node
+        index = self.child_index.get(parent)
+        if index is not None:
+            index[name] = node
+        self.listing_add(parent, name)
+
+    def unlink(self, node):
+        # Исключает узел из списка потомков его родителя
+        parent = self.parent[node]
+        prev, next = self.prev_sibling[node], self.next_sibling[node]
+        if prev == -1:
+            self.first_child[parent] = next
+        else:
+            self.next_sibling[prev] = next
+        if next != -1:
+            self.prev_sibling[next] = prev
+        name = self.node_name(node)
+        index = self.child_index.get(parent)
+        if index is not None:
+            del index[name]
+        self.listing_remove(parent, name)
+
+    def link(self, parent, node, name):
+        if self.node_name(node) != name:
+            self.name[node] = self.intern(name)
+        self.parent[node] = parent
+        self.link_first(parent, node, name)
+
+    def resolve(self, path):
+        # Узел (файл или директория) по абсолютному пути или None
+        path = self.abspath(path)
+        if path == '/':
+            return 0
+        parent = self.navigate(posixpath.dirname(path))
+        if parent is None:
+            return None
+        return self.child(parent, posixpath.basename(path))
+
+    def root_node(self):
+        return 0
+
+    def child_dir(self, node, name):
+        child = self.child(node, name)
+        if child is None or not self.is_dir(child):
+            return None
+        return child
+
+    def node_key(self, node):
+        return node
+
+    def child_names(self, node):
+        return self.children_index(node).keys()
+
+    def file_node(self, path):
+        node = self.resolve(path)
+        if node is None or self.is_dir(node):
+            return None
+        if self.member_of[node] >= 0:
+            return self.index[self.member_of[node]]
+        return self.contents.get(node, b'')
+
+    def add_path(self, path, source=None):
+        parts = [part for part in path.split('/') if part]
+        is_dir = path.endswith('/')
+        created = False
+        current = 0
+        for i, part in enumerate(parts):
+            child = self.child(current, part)
+            if i == len(parts) - 1 and not is_dir:
+                if child is None:
+                    self.contents[self.new_node(current, part, 0)] = b''
+                    created = True
+            else:
+                if child is None:
+                    child = self.new_node(current, part, self.DIR)
+                    created = True
+                elif not self.is_dir(child):
+                    self.flags[child] |= self.DIR
+                current = child
+        if created and source is None:
+            self.journal.append(('add', path.lstrip('/'), None))
+
+    def move(self, src, dest, cwd):
+        src_path = self.abspath(src, cwd)
+        dest_path = self.abspath(dest, cwd)
+        src_parts = [part for part in src_path.split('/') if part]
+        dest_parts = [part for part in dest_path.split('/') if part]
+        if not src_parts or dest_path == src_path or dest_path.startswith(src_path + '/'):
+            return False  # Директорию нельзя переместить в себя или в своё поддерево
+
+        item = self.resolve(src_path)
+        if item is None:
+            return False  # Элемент для перемещения не найден
+        src_parent = self.parent[item]
+        src_name = self.node_name(item)
+        self.unlink(item)
+
+        dest_dir = self.navigate(dest_path)
+        if dest_dir is not None:
+            # Перемещение внутрь существующей директории
+            dest_parts = dest_parts + [src_parts[-1]]
+        else:
+            # Переименование или перемещение с новым именем
+            dest_dir = 0
+            for part in dest_parts[:-1]:
+                child = self.child(dest_dir, part)
+                if child is None:
+                    child = self.new_node(dest_dir, part, self.DIR)
+                elif not self.is_dir(child):
+                    dest_dir = None  # Некорректный путь назначения
+                    break
+                dest_dir = child
+        if dest_dir is None or not dest_parts or self.child(dest_dir, dest_parts[-1]) is not None:
+            # Имя уже существует в целевой директории: возвращаем элемент на место
+            self.link(src_parent, item, src_name)
+            return False
+
+        self.link(dest_dir, item, dest_parts[-1])
+        self.invalidate(src_path)
+        self.journal.append(('mv', '/'.join(src_parts), '/'.join(dest_parts)))
+        return True
+
+    def save_zip(self, compact=False):
+        changed = bool(self.journal)
+        super().save_zip(compact)
+        if changed:
+            # Позиции элементов в индексе поменялись, таблицу строим заново
+            self.build_table()
+
+    def rebase(self):
+        pass
+
+class SessionFileSystem(VirtualFileSystem):
+    # Дерево одной сессии сервера поверх общего снимка с копированием при записи:
+    # перед изменением копируются (неглубоко) только директории на изменяемом
+    # пути, перемещаемые поддеревья и всё остальное остаются общими со снимком
+    def __init__(self, base, root):
+        self.zip_path = base.zip_path
+        self.lazy = base.lazy
+        self.index = base.index
+        self.offsets = base.offsets
+        self.compressed_sizes = base.compressed_sizes
+        self.sizes = base.sizes
+        self.methods = base.methods
+        self.mapping = None
+        self.path_cache = OrderedDict()
+        self.reset(root)
+
+    def reset(self, root):
+        # Начинает сессию заново от снимка root, отбрасывая свои изменения
+        self.fs = dict(self.expand(root))
+        self.owned = {id(self.fs): self.fs}
+        self.path_cache.clear()
+        self.listings = {}
+        self.journal = []
+
+    def own_dir(self, path):
+        # Делает собственными сессии существующие директории на пути
+        node = self.fs
+        current = ''
+        for name in [part for part in path.split('/') if part]:
+            child = node.get(name)
+            if not isinstance(child, dict):
+                break
+            current += '/' + name
+            if id(child) not in self.owned:
+                child = dict(self.expand(child))
+                node[name] = child
+                self.owned[id(child)] = child
+                if current in self.path_cache:
+                    self.path_cache[current] = child
+            node = child
+
+    def add_path(self, path, source=None):
+        self.own_dir(path)
+        super().add_path(path, source)
+
+    def move(self, src, dest, cwd):
+        self.own_dir(posixpath.dirname(self.abspath(src, cwd)))
+        self.own_dir(self.abspath(dest, cwd))
+        return super().move(src, dest, cwd)
+
+class VfsServer:
+    # Сервер сессий: архив загружается один раз, каждое подключение к
+    # Unix-сокету получает свою сессию поверх последнего зафиксированного снимка
+    def __init__(self, vfs, username):
+        self.vfs = vfs
+        self.username = username
+        self.snapshot = vfs.fs
+        self.journal = []   # зафиксированные изменения для сохранения в архив
+
+    def commit(self, session):
+        # Переносит изменения сессии в новый общий снимок. Сессии, открытые
+        # раньше, продолжают видеть свой снимок. При конфликте снимок не меняется
+        merged = SessionFileSystem(self.vfs, self.snapshot)
+        for op, path, dest in session.journal:
+            if op == 'mv':
+                if merged.locate(dest) is not None or not merged.move('/' + path, '/' + dest, '/'):
+                    return False
+            else:
+                merged.add_path(path)
+        self.snapshot = merged.fs
+        self.journal.extend(merged.journal)
+        session.reset(self.snapshot)
+        return True
+
+    def finish(self):
+        # Передаёт зафиксированный снимок и журнал основной ФС для сохранения
+        self.vfs.fs = self.snapshot
+        self.vfs.journal = self.journal
+        self.vfs.path_cache.clear()
+        self.vfs.listings = {}
+
+    async def handle(self, reader, writer):
+        session = SessionFileSystem(self.vfs, self.snapshot)
+        buffer = io.BytesIO()
+        shell = Shell(session, self.username, io.TextIOWrapper(buffer, encoding='utf-8', write_through=True))
         try:
-            command = input(prompt).strip()
-        except EOFError:
-            print()
-            break
+            writer.write(shell.prompt().encode('utf-8'))
+            await writer.drain()
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode('utf-8', 'replace').strip()
+                if command == 'commit':
+                    if self.commit(session):
+                        print("Изменения зафиксированы.", file=shell.out)
+                    else:
+                        print("commit: конфликт с зафиксированными изменениями, выполните rollback", file=shell.out)
+                elif command == 'rollback':
+                    session.reset(self.snapshot)
+                    print("Изменения сессии отменены.", file=shell.out)
+                elif not shell.execute(command):
+                    break
+                writer.write(buffer.getvalue() + shell.prompt().encode('utf-8'))
+                buffer.seek(0)
+                buffer.truncate()
+                await writer.drain()
+        finally:
+            session.close()
+            writer.close()
+            await writer.wait_closed()
+
+    async def serve(self, socket_path):
+        # Работает до SIGINT или SIGTERM
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        server = await asyncio.start_unix_server(self.handle, path=socket_path)
+        async with server:
+            await stop.wait()
+
+def run_server(vfs, username, socket_path):
+    server = VfsServer(vfs, username)
+    print(f"Сервер эмулятора слушает {socket_path}. Остановка - Ctrl+C.", flush=True)
+    try:
+        asyncio.run(server.serve(socket_path))
+    finally:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server.finish()
+
+class Shell:
+    # Выполнение команд эмулятора; вывод идёт в поток out (по умолчанию stdout)
+    def __init__(self, vfs, username, out=None):
+        self.vfs = vfs
+        self.username = username
+        self.cwd = '/'
+        self.out = out or sys.stdout
 
-        if not command:
-            continue
+    def prompt(self):
+        return f"{self.username}@emulator:{self.cwd}$ "
 
+    def execute(self, command):
+        # Выполняет одну команду, возвращает False по команде exit
         parts = command.split()
+        if not parts:
+            return True
         cmd = parts[0]
         args_cmd = parts[1:]
+        vfs = self.vfs
+        out = self.out
 
         if cmd == 'exit':
-            break
+            return False
         elif cmd == 'ls':
-            target = args_cmd[0] if args_cmd else cwd
-            target_path = posixpath.join(cwd, target) if not posixpath.isabs(target) else target
-            target_path = posixpath.normpath(target_path)
-            listing = vfs.list_dir(target_path)
-            if listing is None:
-                print(f"ls: cannot access '{target}': No such file or directory")
+            parsed = parse_ls_args(args_cmd)
+            if parsed is None:
+                print("Использование: ls [--offset N] [--limit N] [путь]", file=out)
+                return True
+            target, offset, limit = parsed
+            target = target or self.cwd
+            pages = vfs.iter_dir(vfs.abspath(target, self.cwd), offset, limit)
+            if pages is None:
+                print(f"ls: cannot access '{target}': No such file or directory", file=out)
             else:
-                print('  '.join(listing))
+                # Выводим по страницам, не собирая весь листинг в одну строку
+                separator = ''
+                for page in pages:
+                    out.write(separator + '  '.join(page))
+                    separator = '  '
+                out.write('\n')
         elif cmd == 'cd':
             if not args_cmd:
-                cwd = '/'
-                continue
+                self.cwd = '/'
+                return True
             target = args_cmd[0]
-            if target == '/':
-                cwd = '/'
-                continue
-            target_path = posixpath.join(cwd, target) if not posixpath.isabs(target) else target
-            target_path = posixpath.normpath(target_path)
+            target_path = vfs.abspath(target, self.cwd)
             dir = vfs.navigate(target_path)
             if dir is not None:
-                cwd = target_path
+                self.cwd = target_path
             else:
-                print(f"cd: no such file or directory: {target}")
+                print(f"cd: no such file or directory: {target}", file=out)
+        elif cmd == 'cat':
+            for target in args_cmd:
+                chunks = vfs.iter_file(vfs.abspath(target, self.cwd))
+                if chunks is None:
+                    print(f"cat: {target}: No such file or directory", file=out)
+                    continue
+                out.flush()
+                for chunk in chunks:
+                    out.buffer.write(chunk)
         elif cmd == 'pwd':
-            print(cwd)
+            print(self.cwd, file=out)
         elif cmd == 'whoami':
-            print(username)
+            print(self.username, file=out)
         elif cmd == 'mv':
-            if len(args_cmd) != 2:
-                print("Использование: mv <источник> <назначение>")
+            if len(args_cmd) < 2:
+                print("Использование: mv <источник>... <назначение>", file=out)
+                return True
+            *sources, dest = args_cmd
+            for src in vfs.move_many(sources, dest, self.cwd):
+                print(f"mv: cannot move '{src}' to '{dest}': Operation failed", file=out)
+        elif cmd == 'find':
+            parsed = parse_find_args(args_cmd)
+            if parsed is None:
+                print("Использование: find [путь] [-name шаблон] [-type f|d]", file=out)
+                return True
+            target, name, type = parsed
+            target_path = vfs.abspath(target, self.cwd)
+            paths = vfs.find(target_path, name, type)
+            if paths is None:
+                print(f"find: '{target}': No such file or directory", file=out)
+                return True
+            # Пути выводятся относительно указанного аргумента, как в find
+            base = target_path.rstrip('/')
+            for path in paths:
+                print(target if path == target_path else target.rstrip('/') + path[len(base):], file=out)
+        elif cmd == 'du':
+            summary = '-s' in args_cmd
+            targets = [arg for arg in args_cmd if arg != '-s'] or ['.']
+            for target in targets:
+                usage = vfs.disk_usage(vfs.abspath(target, self.cwd))
+                if usage is None:
+                    print(f"du: cannot access '{target}': No such file or directory", file=out)
+                    continue
+                target_path = vfs.abspath(target, self.cwd)
+                base = target_path.rstrip('/')
+                total = 0
+                for path, total in usage:
+                    if not summary:
+                        display = target if path == target_path else target.rstrip('/') + path[len(base):]
+                        print(f"{total}\t{display}", file=out)
+                if summary:
+                    print(f"{total}\t{target}", file=out)
+        else:
+            print(f"{cmd}: команда не найдена", file=out)
+        return True
+
+def run_interactive(shell):
+    while True:
+        try:
+            command = input(shell.prompt()).strip()
+        except EOFError:
+            print()
+            break
+        if not shell.execute(command):
+            break
+        sys.stdout.flush()
+        sys.stdout.buffer.flush()
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
+
+def run_batch(shell, script_path=None, out=None):
+    # Пакетный режим: команды из файла или stdin без приглашений, вывод
+    # буферизуется, в конце в stderr печатается статистика производительности.
+    # Пустые строки и строки, начинающиеся с '#', пропускаются.
+    # Возвращает задержки выполнения по именам команд
+    sys.stdout.flush()
+    if out is None:
+        out = open(sys.stdout.fileno(), 'w', buffering=1 << 20,
+                   encoding=sys.stdout.encoding, closefd=False)
+    shell.out = out
+    source = open(script_path, encoding='utf-8') if script_path else sys.stdin
+    latencies = {}
+    started = time.perf_counter()
+    try:
+        for line in source:
+            command = line.strip()
+            if not command or command.startswith('#'):
                 continue
-            src, dest = args_cmd
-            success = vfs.move(src, dest, cwd)
-            if not success:
-                print(f"mv: cannot move '{src}' to '{dest}': Operation failed")
+            start = time.perf_counter()
+            running = shell.execute(command)
+            latencies.setdefault(command.split()[0], []).append(time.perf_counter() - start)
+            if not running:
+                break
+    finally:
+        elapsed = time.perf_counter() - started
+        shell.out.flush()
+        shell.out = sys.stdout
+        if script_path:
+            source.close()
+    report_batch_stats(latencies, elapsed)
+    return latencies
+
+def report_batch_stats(latencies, elapsed):
+    total = sum(len(values) for values in latencies.values())
+    if not total:
+        return
+    rate = total / elapsed if elapsed else float('inf')
+    print(f"Команд выполнено: {total} за {elapsed:.3f} с ({rate:.0f} команд/с)", file=sys.stderr)
+    print(f"{'команда':>10} {'кол-во':>8} {'p50, мс':>9} {'p90, мс':>9} {'p99, мс':>9} {'max, мс':>9}", file=sys.stderr)
+    rows = sorted(latencies.items())
+    rows.append(('всего', [value for values in latencies.values() for value in values]))
+    for cmd, values in rows:
+        values.sort()
+        print(f"{cmd:>10} {len(values):>8} {percentile(values, 50) * 1000:>9.3f} "
+              f"{percentile(values, 90) * 1000:>9.3f} {percentile(values, 99) * 1000:>9.3f} "
+              f"{values[-1] * 1000:>9.3f}", file=sys.stderr)
+
+def parse_ls_args(args):
+    # Разбирает аргументы ls: (путь или None, смещение, лимит) либо None при ошибке
+    target, offset, limit = None, 0, None
+    args = iter(args)
+    for arg in args:
+        if arg in ('--offset', '--limit'):
+            value = next(args, '')
+            if not value.isdigit():
+                return None
+            if arg == '--offset':
+                offset = int(value)
+            else:
+                limit = int(value)
+        elif target is None:
+            target = arg
         else:
-            print(f"{cmd}: команда не найдена")
+            return None
+    return target, offset, limit
+
+def parse_find_args(args):
+    # Разбирает аргументы find: (путь, шаблон имени, тип) либо None при ошибке
+    target, name, type = None, None, None
+    args = iter(args)
+    for arg in args:
+        if arg == '-name':
+            name = next(args, None)
+            if name is None:
+                return None
+        elif arg == '-type':
+            type = next(args, None)
+            if type not in ('f', 'd'):
+                return None
+        elif target is None and not arg.startswith('-'):
+            target = arg
+        else:
+            return None
+    return target or '.', name, type
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Эмулятор оболочки ОС с виртуальной файловой системой.')
+    parser.add_argument('username', help='Имя пользователя для приглашения к вводу.')
+    parser.add_argument('zip_path', help='Путь к архиву виртуальной файловой системы (zip).')
+    parser.add_argument('--lazy', action='store_true',
+                        help='Ленивая загрузка: директории читаются из индекса архива при первом обращении.')
+    parser.add_argument('--compact', action='store_true',
+                        help='Компактное дерево в виде таблицы узлов (меньше памяти на элемент).')
+    parser.add_argument('--script', help='Пакетный режим: выполнить команды из файла и вывести статистику.')
+    parser.add_argument('--serve', metavar='SOCKET',
+                        help='Режим сервера: общий архив для многих сессий через Unix-сокет.')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    username = args.username
+    zip_path = args.zip_path
+
+    if not zip_path.endswith('.zip'):
+        print(f"Ошибка: Файл {zip_path} не является zip-архивом.")
+        sys.exit(1)
+
+    if args.serve and args.compact:
+        print("Ошибка: режим сервера не поддерживает --compact.")
+        sys.exit(1)
+
+    try:
+        if args.compact:
+            vfs = CompactFileSystem(zip_path)
+        else:
+            vfs = VirtualFileSystem(zip_path, lazy=args.lazy)
+    except zipfile.BadZipFile:
+        print(f"Ошибка: Файл {zip_path} не является корректным zip-архивом.")
+        sys.exit(1)
+
+    if args.serve:
+        run_server(vfs, username, args.serve)
+    elif args.script or not sys.stdin.isatty():
+        run_batch(Shell(vfs, username), args.script)
+    else:
+        run_interactive(Shell(vfs, username))
 
     try:
         vfs.save_zip()
+        vfs.close()
         print("Выход из эмулятора. Изменения сохранены.")
     except Exception as e:
         print(f"Ошибка при сохранении архива: {e}")
@@ -1,7 +1,10 @@
+import io
+import mmap
+import asyncio
 import zipfile
 import tempfile
 import os
-from shell_emulator import VirtualFileSystem
+from shell_emulator import VirtualFileSystem, CompactFileSystem, SessionFileSystem, VfsServer, Shell, run_batch
 
 def create_temp_zip(structure):
     """
@@ -125,6 +128,47 @@ def test_move():
         os.unlink(zip_path)
     print("Тест move завершен.\n")
 
+def test_move_into_subtree():
+    print("Запуск теста: move_into_subtree")
+    structure = {
+        'dir1/sub/file.txt': 'Content',
+        'dir1/other.txt': 'Other'
+    }
+    zip_path = create_temp_zip(structure)
+    try:
+        for vfs in (VirtualFileSystem(zip_path), VirtualFileSystem(zip_path, lazy=True), CompactFileSystem(zip_path)):
+            # Путь назначения уже в кэше, но перемещение в своё поддерево должно быть отклонено
+            vfs.list_dir('/dir1/sub')
+            assert not vfs.move('dir1', 'dir1/sub', '/'), "Перемещение директории в своё поддерево должно быть отклонено"
+            assert not vfs.move('dir1', 'dir1', '/'), "Перемещение директории в себя должно быть отклонено"
+            assert vfs.list_dir('/') == ['dir1'], "Директория не должна пропадать"
+            assert vfs.list_dir('/dir1/sub') == ['file.txt'], "Содержимое директории не должно пропадать"
+            assert vfs.journal == [], "Отклонённое перемещение не должно попадать в журнал"
+            vfs.close()
+    finally:
+        os.unlink(zip_path)
+    print("Тест move_into_subtree завершен.\n")
+
+def test_move_empties_implicit_dir():
+    print("Запуск теста: move_empties_implicit_dir")
+    # У директории d нет своего элемента 'd/' в архиве
+    for make in (VirtualFileSystem, lambda path: VirtualFileSystem(path, lazy=True), CompactFileSystem):
+        for compact in (False, True):
+            zip_path = create_temp_zip({'d/x': 'Content'})
+            try:
+                vfs = make(zip_path)
+                assert vfs.move('d/x', 'x', '/'), "Перемещение файла должно пройти"
+                vfs.save_zip(compact)
+                assert vfs.list_dir('/') == ['d', 'x'], f"Опустевшая директория пропала после сохранения: {vfs.list_dir('/')}"
+                vfs.close()
+                vfs = make(zip_path)
+                assert vfs.list_dir('/') == ['d', 'x'], f"Опустевшая директория пропала из архива: {vfs.list_dir('/')}"
+                assert vfs.list_dir('/d') == [], "Директория должна остаться пустой"
+                vfs.close()
+            finally:
+                os.unlink(zip_path)
+    print("Тест move_empties_implicit_dir завершен.\n")
+
 def test_ls_commands():
     print("Запуск теста: ls_commands")
     # Создаем структуру
@@ -235,6 +279,372 @@ def test_mv_commands():
         os.unlink(zip_path)
     print("Тест mv_commands завершен.\n")
 
+def test_lazy_load():
+    print("Запуск теста: lazy_load")
+    structure = {
+        'file1.txt': 'Content of file1',
+        'dir1/file2.txt': 'Content of file2',
+        'dir1/dir2/file3.txt': 'Content of file3',
+        'dir1.txt': 'Content of dir1.txt',
+        'empty/': ''
+    }
+    zip_path = create_temp_zip(structure)
+    vfs = VirtualFileSystem(zip_path, lazy=True)
+    
+    try:
+        # Тест 1: до первого обращения дерево не построено
+        assert len(vfs.fs) == 0, "Корневая директория не должна строиться при загрузке"
+        
+        # Тест 2: развёртываются только запрошенные директории
+        listing = vfs.list_dir('/')
+        expected = ['dir1', 'dir1.txt', 'empty', 'file1.txt']
+        assert listing == expected, f"Ожидалось {expected}, получено {listing}"
+        assert len(vfs.fs['dir1']) == 0, "Поддиректория не должна развёртываться раньше времени"
+        
+        # Тест 3: навигация в глубинную директорию
+        dir = vfs.navigate('/dir1/dir2')
+        assert isinstance(dir, dict) and 'file3.txt' in dir, "Неверная навигация в '/dir1/dir2'"
+        assert vfs.list_dir('/empty') == [], "Директория 'empty' должна быть пустой"
+        
+        # Тест 4: перемещение в ленивом режиме
+        success = vfs.move('dir1/dir2', 'empty', '/')
+        assert success, "Перемещение 'dir1/dir2' в 'empty' не удалось"
+        listing = vfs.list_dir('/empty/dir2')
+        assert listing == ['file3.txt'], f"Ожидалось ['file3.txt'], получено {listing}"
+    finally:
+        os.unlink(zip_path)
+    print("Тест lazy_load завершен.\n")
+
+def test_save_zip():
+    print("Запуск теста: save_zip")
+    structure = {
+        'file1.txt': 'Content of file1',
+        'dir1/file2.txt': 'Content of file2' * 100,
+        'dir2/': ''
+    }
+    zip_path = create_temp_zip(structure)
+    
+    try:
+        # Тест 1: без изменений архив не перезаписывается
+        with open(zip_path, 'rb') as f:
+            original = f.read()
+        vfs = VirtualFileSystem(zip_path)
+        vfs.save_zip()
+        with open(zip_path, 'rb') as f:
+            assert f.read() == original, "Архив без изменений не должен перезаписываться"
+        
+        # Тест 2: перемещение сохраняется вместе с содержимым файлов
+        vfs.move('dir1', 'dir2', '/')
+        vfs.move('file1.txt', 'dir2/dir1/file1.txt', '/')
+        vfs.add_path('dir3/new.txt')
+        vfs.save_zip()
+        with zipfile.ZipFile(zip_path) as z:
+            names = set(z.namelist())
+            assert {'dir2/', 'dir2/dir1/file2.txt', 'dir2/dir1/file1.txt', 'dir3/new.txt'} <= names, f"Неверный состав архива: {names}"
+            assert 'file1.txt' not in names and 'dir1/file2.txt' not in names, f"Старые имена остались в архиве: {names}"
+            assert z.read('dir2/dir1/file2.txt') == b'Content of file2' * 100, "Содержимое файла было потеряно"
+            assert z.testzip() is None, "Архив повреждён"
+        
+        # Тест 3: после сохранения можно продолжать работу, compact переписывает архив
+        vfs.move('dir2/dir1/file1.txt', 'file1.txt', '/')
+        vfs.save_zip(compact=True)
+        with zipfile.ZipFile(zip_path) as z:
+            assert z.read('file1.txt') == b'Content of file1', "Содержимое файла было потеряно"
+            assert len(z.namelist()) == len(set(z.namelist())), "В архиве есть дубликаты"
+        
+        # Тест 4: сохранение в ленивом режиме
+        vfs = VirtualFileSystem(zip_path, lazy=True)
+        vfs.move('dir2', 'dir4', '/')
+        vfs.save_zip()
+        assert vfs.list_dir('/dir4/dir1') == ['file2.txt'], "Дерево после сохранения не совпадает с архивом"
+        with zipfile.ZipFile(zip_path) as z:
+            assert z.read('dir4/dir1/file2.txt') == b'Content of file2' * 100, "Содержимое файла было потеряно"
+        assert VirtualFileSystem(zip_path).list_dir('/') == ['dir3', 'dir4', 'file1.txt'], "Архив не перечитывается после сохранения"
+    finally:
+        os.unlink(zip_path)
+    print("Тест save_zip завершен.\n")
+
+def test_read_file():
+    print("Запуск теста: read_file")
+    zip_path = create_temp_zip({'dir1/': ''})
+    with zipfile.ZipFile(zip_path, 'w') as z:
+        z.writestr('stored.txt', b'Stored content' * 100)
+        z.writestr('dir1/deflated.txt', bytes(range(256)) * 100, compress_type=zipfile.ZIP_DEFLATED)
+    vfs = VirtualFileSystem(zip_path)
+    
+    try:
+        # Тест 1: несжатый файл отдаётся срезом отображения архива без копирования
+        view = vfs.read_file('/stored.txt')
+        assert isinstance(view, memoryview) and isinstance(view.obj, mmap.mmap), "Несжатый файл должен читаться через mmap"
+        assert bytes(view) == b'Stored content' * 100, "Неверное содержимое несжатого файла"
+        view.release()
+        
+        # Тест 2: сжатый файл распаковывается кусками ограниченного размера
+        chunks = list(vfs.iter_file('/dir1/deflated.txt', chunk_size=1024))
+        assert all(len(chunk) <= 1024 for chunk in chunks), "Кусок больше заданного размера"
+        assert b''.join(chunks) == bytes(range(256)) * 100, "Неверное содержимое сжатого файла"
+        
+        # Тест 3: директории и несуществующие пути не читаются
+        assert vfs.read_file('/dir1') is None, "Директория не должна читаться как файл"
+        assert vfs.iter_file('/missing.txt') is None, "Несуществующий файл не должен читаться"
+        
+        # Тест 4: содержимое доступно после перемещения и для новых файлов
+        vfs.move('dir1/deflated.txt', 'moved.txt', '/')
+        assert bytes(vfs.read_file('moved.txt')) == bytes(range(256)) * 100, "Содержимое потеряно после перемещения"
+        vfs.add_path('new.txt')
+        assert bytes(vfs.read_file('/new.txt')) == b'', "Новый файл должен быть пустым"
+    finally:
+        vfs.close()
+        os.unlink(zip_path)
+    print("Тест read_file завершен.\n")
+
+def test_compact_fs():
+    print("Запуск теста: compact_fs")
+    structure = {
+        'file1.txt': 'Content of file1',
+        'dir1/file2.txt': 'Content of file2',
+        'dir1/dir2/file3.txt': 'Content of file3',
+        'dir3/': ''
+    }
+    zip_path = create_temp_zip(structure)
+    vfs = CompactFileSystem(zip_path)
+    
+    try:
+        # Тест 1: то же содержимое, что и у словарного дерева
+        reference = VirtualFileSystem(zip_path)
+        for path in ['/', '/dir1', '/dir1/dir2', '/dir3']:
+            assert vfs.list_dir(path) == reference.list_dir(path), f"Листинг '{path}' отличается от словарного дерева"
+        assert vfs.navigate('/dir1/file2.txt') is None, "Файл не должен открываться как директория"
+        assert vfs.navigate('/nonexistent') is None, "Несуществующая директория должна возвращать None"
+        
+        # Тест 2: перемещение и переименование
+        assert vfs.move('file1.txt', 'dir3', '/'), "Перемещение 'file1.txt' в 'dir3' не удалось"
+        assert vfs.move('dir1/dir2', 'renamed', '/'), "Переименование 'dir1/dir2' не удалось"
+        assert not vfs.move('dir1', 'dir3/file1.txt', '/'), "Перемещение поверх существующего файла должно завершиться ошибкой"
+        assert vfs.move('renamed', 'dir1', '/'), "Перемещение 'renamed' в 'dir1' не удалось"
+        assert vfs.list_dir('/dir1') == ['file2.txt', 'renamed'], f"Неверное перемещение в 'dir1': {vfs.list_dir('/dir1')}"
+        assert vfs.list_dir('/') == ['dir1', 'dir3'], f"Неверный корень: {vfs.list_dir('/')}"
+        assert bytes(vfs.read_file('/dir3/file1.txt')) == b'Content of file1', "Содержимое потеряно после перемещения"
+        
+        # Тест 3: сохранение и повторная загрузка
+        vfs.save_zip()
+        vfs.close()
+        for path in ['/', '/dir1', '/dir1/renamed', '/dir3']:
+            assert CompactFileSystem(zip_path).list_dir(path) == VirtualFileSystem(zip_path).list_dir(path), f"Листинг '{path}' после сохранения отличается"
+        assert vfs.list_dir('/dir1/renamed') == ['file3.txt'], "Таблица узлов не перестроена после сохранения"
+    finally:
+        vfs.close()
+        os.unlink(zip_path)
+
+    # Тест 4: большая директория с индексом имён ведёт себя как словарное дерево
+    structure = {f'wide/file{i:03d}.txt': str(i) for i in range(100)}
+    structure['wide/sub/inner.txt'] = 'Inner'
+    zip_path = create_temp_zip(structure)
+    vfs = CompactFileSystem(zip_path)
+    try:
+        reference = VirtualFileSystem(zip_path)
+        assert vfs.list_dir('/wide') == reference.list_dir('/wide'), "Листинг большой директории отличается"
+        for src, dest in [('wide/file050.txt', 'moved.txt'), ('wide/file000.txt', 'wide/sub'),
+                          ('wide/file099.txt', 'wide/renamed.txt'), ('moved.txt', 'wide/file050.txt')]:
+            assert vfs.move(src, dest, '/') and reference.move(src, dest, '/'), f"Перемещение '{src}' не удалось"
+        assert not vfs.move('wide/file001.txt', 'wide/file002.txt', '/'), "Имя в большой директории должно быть занято"
+        for path in ['/', '/wide', '/wide/sub']:
+            assert vfs.list_dir(path) == reference.list_dir(path), f"Листинг '{path}' отличается после перемещений"
+        assert bytes(vfs.read_file('/wide/renamed.txt')) == b'99', "Файл не находится по новому имени"
+        assert vfs.read_file('/wide/file099.txt') is None, "Старое имя должно исчезнуть из индекса"
+    finally:
+        vfs.close()
+        os.unlink(zip_path)
+    print("Тест compact_fs завершен.\n")
+
+def test_path_cache():
+    print("Запуск теста: path_cache")
+    structure = {
+        'dir1/dir2/dir3/file1.txt': 'Content of file1',
+        'dir4/': ''
+    }
+    zip_path = create_temp_zip(structure)
+    
+    try:
+        for vfs in (VirtualFileSystem(zip_path), CompactFileSystem(zip_path)):
+            # Тест 1: поддержка '..' и '.'
+            assert vfs.abspath('../dir2/./dir3', '/dir1/dir2') == '/dir1/dir2/dir3', "Неверная нормализация пути"
+            assert vfs.abspath('../../..', '/dir1') == '/', "Нельзя подняться выше корня"
+            assert vfs.list_dir('/dir1/dir2/dir3/../..') == ['dir2'], "Переход вверх через '..' не работает"
+            
+            # Тест 2: повторное обращение берётся из кэша
+            node = vfs.navigate('/dir1/dir2/dir3')
+            assert '/dir1/dir2/dir3' in vfs.path_cache and '/dir1' in vfs.path_cache, "Пройденные директории должны кэшироваться"
+            assert vfs.navigate('dir1/dir2/dir3/') is node, "Повторная навигация должна вернуть тот же узел"
+            
+            # Тест 3: перемещение сбрасывает кэш только для своего поддерева
+            vfs.navigate('/dir4')
+            assert vfs.move('dir1/dir2', 'dir4', '/'), "Перемещение 'dir1/dir2' в 'dir4' не удалось"
+            assert '/dir1/dir2/dir3' not in vfs.path_cache and '/dir4' in vfs.path_cache, "Кэш сброшен неточно"
+            assert vfs.navigate('/dir1/dir2/dir3') is None, "Старый путь не должен разрешаться после перемещения"
+            assert vfs.list_dir('/dir4/dir2/dir3') == ['file1.txt'], "Новый путь не разрешается после перемещения"
+    finally:
+        os.unlink(zip_path)
+    print("Тест path_cache завершен.\n")
+
+def test_sorted_listing():
+    print("Запуск теста: sorted_listing")
+    structure = {f'big/file{i:04d}.txt': '' for i in range(2500)}
+    structure['other/extra.txt'] = ''
+    zip_path = create_temp_zip(structure)
+    
+    try:
+        for vfs in (VirtualFileSystem(zip_path), CompactFileSystem(zip_path)):
+            expected = sorted(f'file{i:04d}.txt' for i in range(2500))
+            
+            # Тест 1: постраничный листинг
+            assert vfs.list_dir('/big') == expected, "Неверный листинг большой директории"
+            assert vfs.list_dir('/big', offset=10, limit=5) == expected[10:15], "Неверная страница листинга"
+            pages = list(vfs.iter_dir('/big', page_size=1000))
+            assert [len(page) for page in pages] == [1000, 1000, 500], "Неверное разбиение на страницы"
+            assert vfs.iter_dir('/missing') is None, "Листинг несуществующей директории должен возвращать None"
+            
+            # Тест 2: перемещение обновляет уже отсортированные списки
+            assert vfs.move('other/extra.txt', 'big/aaa.txt', '/'), "Перемещение 'extra.txt' не удалось"
+            assert vfs.move('big/file0000.txt', 'other', '/'), "Перемещение 'file0000.txt' не удалось"
+            listing = vfs.list_dir('/big', limit=2)
+            assert listing == ['aaa.txt', 'file0001.txt'], f"Список не обновлён после перемещения: {listing}"
+            assert vfs.list_dir('/other') == ['file0000.txt'], "Список источника не обновлён после перемещения"
+            vfs.add_path('big/zzz.txt')
+            assert vfs.list_dir('/big')[-1] == 'zzz.txt', "Новый файл не попал в отсортированный список"
+    finally:
+        os.unlink(zip_path)
+    print("Тест sorted_listing завершен.\n")
+
+def test_batch_mode():
+    print("Запуск теста: batch_mode")
+    structure = {
+        'dir1/file1.txt': 'Content of file1',
+        'dir2/': ''
+    }
+    zip_path = create_temp_zip(structure)
+    script = tempfile.NamedTemporaryFile('w', delete=False, suffix='.txt', encoding='utf-8')
+    script.write("# комментарий\n\ncd dir1\npwd\ncat file1.txt\nmv file1.txt ../dir2\nls /dir2\nexit\nls\n")
+    script.close()
+    vfs = VirtualFileSystem(zip_path)
+    
+    try:
+        # Тест 1: команды выполняются без приглашений, вывод буферизуется
+        buffer = io.BytesIO()
+        out = io.TextIOWrapper(buffer, encoding='utf-8')
+        shell = Shell(vfs, 'testuser')
+        latencies = run_batch(shell, script.name, out=out)
+        output = buffer.getvalue().decode('utf-8')
+        assert output == "/dir1\nContent of file1file1.txt\n", f"Неверный вывод: {output!r}"
+        
+        # Тест 2: статистика по командам, выполнение останавливается на exit
+        counts = {cmd: len(values) for cmd, values in latencies.items()}
+        assert counts == {'cd': 1, 'pwd': 1, 'cat': 1, 'mv': 1, 'ls': 1, 'exit': 1}, f"Неверная статистика: {counts}"
+        assert shell.cwd == '/dir1', "Рабочая директория должна сохраняться между командами"
+    finally:
+        vfs.close()
+        os.unlink(script.name)
+        os.unlink(zip_path)
+    print("Тест batch_mode завершен.\n")
+
+def test_find_du_glob():
+    print("Запуск теста: find_du_glob")
+    structure = {
+        'dir1/a.txt': '1234',
+        'dir1/b.log': '12',
+        'dir1/sub/c.txt': '123456',
+        'dir2/': '',
+        'deep/' + 'd/' * 3000 + 'leaf.txt': '123'
+    }
+    zip_path = create_temp_zip(structure)
+    
+    try:
+        for vfs in (VirtualFileSystem(zip_path), CompactFileSystem(zip_path)):
+            # Тест 1: find по шаблону имени и типу
+            found = sorted(vfs.find('/dir1', name='*.txt'))
+            assert found == ['/dir1/a.txt', '/dir1/sub/c.txt'], f"Неверный результат find: {found}"
+            found = sorted(vfs.find('/dir1', type='d'))
+            assert found == ['/dir1', '/dir1/sub'], f"Неверный результат find -type d: {found}"
+            assert vfs.find('/missing') is None, "find по несуществующему пути должен возвращать None"
+            
+            # Тест 2: du суммирует размеры из центрального каталога за один проход
+            usage = dict(vfs.disk_usage('/dir1'))
+            assert usage == {'/dir1/sub': 6, '/dir1': 12}, f"Неверный результат du: {usage}"
+            
+            # Тест 3: глубокое дерево обходится без рекурсии
+            usage = list(vfs.disk_usage('/deep'))
+            assert len(usage) == 3001 and usage[-1] == ('/deep', 3), "Неверный обход глубокого дерева"
+            
+            # Тест 4: перемещение по шаблонам и нескольким источникам
+            assert vfs.glob('dir1/*.txt', '/') == ['/dir1/a.txt'], "Неверное раскрытие шаблона"
+            assert vfs.move_many(['dir1/*.txt', 'dir1/b.log'], 'dir2', '/') == [], "Перемещение по шаблону не удалось"
+            assert vfs.list_dir('/dir2') == ['a.txt', 'b.log'], f"Неверное содержимое 'dir2': {vfs.list_dir('/dir2')}"
+            assert vfs.move_many(['dir1/*.zzz'], 'dir2', '/') == ['dir1/*.zzz'], "Шаблон без совпадений должен вернуть ошибку"
+            assert vfs.move_many(['dir2/a.txt', 'dir2/b.log'], 'new_name', '/') == ['dir2/a.txt', 'dir2/b.log'], \
+                "Несколько источников нельзя переместить не в директорию"
+    finally:
+        os.unlink(zip_path)
+    print("Тест find_du_glob завершен.\n")
+
+def test_sessions():
+    print("Запуск теста: sessions")
+    structure = {
+        'dir1/sub/file1.txt': 'Content of file1',
+        'dir2/': '',
+        'file2.txt': 'Content of file2'
+    }
+    zip_path = create_temp_zip(structure)
+    vfs = VirtualFileSystem(zip_path)
+    server = VfsServer(vfs, 'testuser')
+    
+    try:
+        # Тест 1: изменения сессии не видны другим, поддеревья не копируются
+        first = SessionFileSystem(vfs, server.snapshot)
+        second = SessionFileSystem(vfs, server.snapshot)
+        shared = server.snapshot['dir1']['sub']
+        assert first.move('dir1/sub', 'dir2', '/'), "Перемещение в сессии не удалось"
+        assert first.navigate('/dir2/sub') is shared, "Перемещаемое поддерево не должно копироваться"
+        assert second.list_dir('/dir2') == [] and vfs.list_dir('/dir2') == [], "Изменения сессии видны снаружи"
+        
+        # Тест 2: фиксация публикует новый снимок, старые сессии его не видят до rollback
+        assert server.commit(first), "Фиксация изменений не удалась"
+        assert SessionFileSystem(vfs, server.snapshot).list_dir('/dir2') == ['sub'], "Новая сессия не видит зафиксированных изменений"
+        assert second.list_dir('/dir1') == ['sub'], "Старая сессия должна видеть свой снимок"
+        
+        # Тест 3: конфликтующие изменения не фиксируются
+        assert second.move('dir1/sub', 'moved', '/'), "Перемещение во второй сессии не удалось"
+        assert not server.commit(second), "Конфликтующая фиксация должна завершиться ошибкой"
+        second.reset(server.snapshot)
+        assert second.list_dir('/dir2') == ['sub'], "После rollback сессия должна видеть последний снимок"
+        
+        # Тест 4: сессии через Unix-сокет и сохранение зафиксированного
+        socket_path = os.path.join(tempfile.mkdtemp(), 'vfs.sock')
+        
+        async def client():
+            listener = await asyncio.start_unix_server(server.handle, path=socket_path)
+            async with listener:
+                reader, writer = await asyncio.open_unix_connection(socket_path)
+                await reader.readuntil(b'$ ')
+                replies = []
+                for command in ['mv file2.txt dir2', 'ls /dir2', 'commit', 'exit']:
+                    writer.write((command + '\n').encode('utf-8'))
+                    replies.append(await reader.readuntil(b'$ ') if command != 'exit' else await reader.read())
+                writer.close()
+                return replies
+        
+        replies = asyncio.run(client())
+        assert replies[1].startswith(b'file2.txt  sub\n'), f"Неверный ответ сервера: {replies[1]!r}"
+        server.finish()
+        vfs.save_zip()
+        with zipfile.ZipFile(zip_path) as z:
+            names = set(z.namelist())
+        assert {'dir2/sub/file1.txt', 'dir2/file2.txt'} <= names, f"Зафиксированные изменения не сохранены: {names}"
+        os.unlink(socket_path)
+    finally:
+        vfs.close()
+        os.unlink(zip_path)
+    print("Тест sessions завершен.\n")
+
 def run_all_tests():
     print("Запуск всех тестов...\n")
     tests = [
@@ -242,11 +652,22 @@ def run_all_tests():
         (test_list_dir, "list_dir"),
         (test_navigate, "navigate"),
         (test_move, "move"),
+        (test_move_into_subtree, "move_into_subtree"),
+        (test_move_empties_implicit_dir, "move_empties_implicit_dir"),
         (test_ls_commands, "ls_commands"),
         (test_cd_commands, "cd_commands"),
         (test_pwd_commands, "pwd_commands"),
         (test_whoami_commands, "whoami_commands"),
-        (test_mv_commands, "mv_commands")
+        (test_mv_commands, "mv_commands"),
+        (test_lazy_load, "lazy_load"),
+        (test_save_zip, "save_zip"),
+        (test_read_file, "read_file"),
+        (test_compact_fs, "compact_fs"),
+        (test_path_cache, "path_cache"),
+        (test_sorted_listing, "sorted_listing"),
+        (test_batch_mode, "batch_mode"),
+        (test_find_du_glob, "find_du_glob"),
+        (test_sessions, "sessions")
     ]
     
     for test_func, test_name in tests:
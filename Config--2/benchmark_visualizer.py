@@ -0,0 +1,231 @@
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import tracemalloc
+from dependency_visualizer import CACHE_FILE_NAME, build_mermaid_graph, iter_records, write_graph
+
+VARIANTS = {
+    'git': {},
+    'cache-cold': {'use_cache': True},
+    'cache-warm': {'use_cache': True},
+    'native': {'native': True},
+    'native-jobs': {'native': True, 'jobs': os.cpu_count() or 1},
+}
+TARGET_FILE = 'target.txt'
+# Сколько коммитов делается в каждой ветке между слияниями в main
+MERGE_INTERVAL = 10
+# Число различных файлов синтетического репозитория (кроме целевого)
+FILE_POOL = 1000
+# Целевой файл меняется в каждом TARGET_EVERY-м коммите
+TARGET_EVERY = 3
+
+def commit_paths(i, files_per_commit):
+    """
+    Пути, изменяемые i-м коммитом синтетической истории.
+    """
+    paths = [f"dir{(i * files_per_commit + j) % FILE_POOL % 50:02d}/file{(i * files_per_commit + j) % FILE_POOL:04d}.txt"
+             for j in range(files_per_commit)]
+    if i % TARGET_EVERY == 0:
+        paths.append(TARGET_FILE)
+    return paths
+
+def iter_fast_import(commits, branches, files_per_commit):
+    """
+    Поток команд git fast-import для истории из commits коммитов.
+    Коммиты по очереди попадают в branches веток, каждые MERGE_INTERVAL
+    коммитов на ветку боковые ветки сливаются в main и продолжаются от слияния.
+    Слияние переносит изменения боковой ветки, иначе его дерево совпало бы
+    с main и git отбросил бы ветку при упрощении истории.
+    """
+    tips = {}
+    changes = {branch: {} for branch in range(branches)}
+    mark = 0
+    timestamp = 1_000_000_000
+    for i in range(commits):
+        branch = i % branches
+        mark += 1
+        timestamp += 60
+        yield f"commit refs/heads/{'main' if branch == 0 else f'b{branch}'}\nmark :{mark}\n"
+        yield f"committer t <t@t> {timestamp} +0000\ndata 0\n"
+        if branch in tips:
+            yield f"from :{tips[branch]}\n"
+        elif tips:
+            yield f"from :{tips[0]}\n"
+        for path in commit_paths(i, files_per_commit):
+            content = f"{i}\n"
+            changes[branch][path] = content
+            yield f"M 100644 inline {path}\ndata {len(content)}\n{content}\n"
+        tips[branch] = mark
+        if branches > 1 and branch == branches - 1 and (i // branches + 1) % MERGE_INTERVAL == 0:
+            for side in range(1, branches):
+                mark += 1
+                timestamp += 60
+                yield f"commit refs/heads/main\nmark :{mark}\ncommitter t <t@t> {timestamp} +0000\ndata 0\n"
+                yield f"from :{tips[0]}\nmerge :{tips[side]}\n"
+                for path, content in changes[side].items():
+                    yield f"M 100644 inline {path}\ndata {len(content)}\n{content}\n"
+                tips[0] = mark
+            for side in range(1, branches):
+                tips[side] = tips[0]
+                changes[side] = {}
+
+def create_synthetic_repo(path, commits, branches, files_per_commit):
+    """
+    Создает git-репозиторий с синтетической историей через git fast-import.
+    """
+    subprocess.run(['git', 'init', '-q', path], check=True)
+    with subprocess.Popen(['git', '-C', path, 'fast-import', '--quiet'], stdin=subprocess.PIPE, text=True) as process:
+        for chunk in iter_fast_import(commits, branches, files_per_commit):
+            process.stdin.write(chunk)
+        process.stdin.close()
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, 'git fast-import')
+    subprocess.run(['git', '-C', path, 'symbolic-ref', 'HEAD', 'refs/heads/main'], check=True)
+
+class CountingPopen(subprocess.Popen):
+    """
+    Popen, считающий запуски процессов (subprocess.run тоже идёт через него).
+    """
+    launched = 0
+
+    def __init__(self, *args, **kwargs):
+        CountingPopen.launched += 1
+        super().__init__(*args, **kwargs)
+
+def children_rss_kb():
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+def measure_phase(func, trace_memory):
+    """
+    Выполняет func и возвращает (результат, замеры фазы): время, число
+    запущенных процессов и пиковую память. RSS - максимум процесса за всё
+    время работы (ru_maxrss не сбрасывается), поэтому для фазы точна только
+    память Python-объектов, которая замеряется при trace_memory.
+    """
+    launched = CountingPopen.launched
+    if trace_memory:
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    stats = {
+        'wall_s': elapsed,
+        'subprocesses': CountingPopen.launched - launched,
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'children_peak_rss_kb': children_rss_kb(),
+    }
+    if trace_memory:
+        stats['python_peak_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+    return result, stats
+
+def remove_cache(repo_path):
+    cache_path = os.path.join(repo_path, '.git', CACHE_FILE_NAME)
+    if os.path.exists(cache_path):
+        os.unlink(cache_path)
+
+def run_case(repo_path, variant, file_name, trace_memory):
+    """
+    Замеры одного варианта чтения истории: сквозной build_mermaid_graph и
+    отдельно фазы чтения записей и записи графа. Выполняется в отдельном
+    процессе, чтобы пиковый RSS относился только к нему.
+    """
+    options = VARIANTS[variant]
+    subprocess.Popen = CountingPopen
+    if variant == 'cache-warm':
+        build_mermaid_graph(repo_path, file_name, **options)
+    if trace_memory:
+        tracemalloc.start()
+
+    phases = {}
+    if variant == 'cache-cold':
+        remove_cache(repo_path)
+    graph, phases['end_to_end'] = measure_phase(lambda: build_mermaid_graph(repo_path, file_name, **options),
+                                                trace_memory)
+    if variant == 'cache-cold':
+        remove_cache(repo_path)
+    records, phases['records'] = measure_phase(lambda: list(iter_records(repo_path, file_name, **options)),
+                                               trace_memory)
+    _, phases['write'] = measure_phase(lambda: write_graph(records, io.StringIO()), trace_memory)
+    if trace_memory:
+        tracemalloc.stop()
+    return {
+        'variant': variant,
+        'file_name': file_name,
+        'nodes': len(records),
+        'graph_bytes': len(graph.encode('utf-8')),
+        'phases': phases,
+    }
+
+def run_suite(sizes, branches, files_per_commit, variants, file_name, trace_memory, output):
+    work_dir = tempfile.mkdtemp()
+    results = []
+    try:
+        for commits in sizes:
+            repo_path = os.path.join(work_dir, f'repo-{commits}')
+            start = time.perf_counter()
+            create_synthetic_repo(repo_path, commits, branches, files_per_commit)
+            print(f"Репозиторий: {commits} коммитов, веток {branches}, файлов в коммите {files_per_commit}, "
+                  f"создан за {time.perf_counter() - start:.2f} с", file=sys.stderr)
+            for variant in variants:
+                command = [sys.executable, os.path.abspath(__file__), '--case', repo_path, variant, file_name]
+                if trace_memory:
+                    command.append('--trace-memory')
+                process = subprocess.run(command, stdout=subprocess.PIPE, text=True, check=True)
+                result = json.loads(process.stdout)
+                result.update(commits=commits, branches=branches, files_per_commit=files_per_commit)
+                results.append(result)
+                phases = result['phases']
+                print(f"{commits:>8} {variant:>11}: сквозной проход {phases['end_to_end']['wall_s']:.3f} с, "
+                      f"чтение {phases['records']['wall_s']:.3f} с, запись {phases['write']['wall_s']:.3f} с, "
+                      f"процессов {phases['end_to_end']['subprocesses']}, "
+                      f"RSS {phases['write']['peak_rss_kb'] / 1024:.1f} МиБ", file=sys.stderr)
+            shutil.rmtree(repo_path)
+    finally:
+        shutil.rmtree(work_dir)
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'git': subprocess.run(['git', '--version'], stdout=subprocess.PIPE, text=True).stdout.strip(),
+        'results': results,
+    }
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарки построения графа зависимостей на синтетических репозиториях.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000],
+                        help='Числа коммитов синтетических репозиториев.')
+    parser.add_argument('--branches', type=int, default=1,
+                        help='Число параллельных веток, периодически сливаемых в main (1 - линейная история).')
+    parser.add_argument('--files-per-commit', type=int, default=3, help='Число файлов, меняемых каждым коммитом.')
+    parser.add_argument('--variants', nargs='+', choices=list(VARIANTS), default=list(VARIANTS),
+                        help='Способы чтения истории.')
+    parser.add_argument('--file-name', default=TARGET_FILE,
+                        help='Путь, для которого строится граф ("." - вся история).')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='Замерять пиковую память Python-объектов по фазам (замедляет замеры времени).')
+    parser.add_argument('--output', help='Файл для результатов в формате JSON (по умолчанию stdout).')
+    parser.add_argument('--case', nargs=3, metavar=('REPO', 'VARIANT', 'FILE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        repo_path, variant, file_name = args.case
+        print(json.dumps(run_case(repo_path, variant, file_name, args.trace_memory)))
+    else:
+        run_suite(args.sizes, args.branches, args.files_per_commit, args.variants, args.file_name,
+                  args.trace_memory, args.output)
+
+if __name__ == "__main__":
+    main()
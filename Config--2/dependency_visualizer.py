@@ -1,7 +1,38 @@
+import io
 import os
+import sys
+import json
+import time
+import zlib
+import sqlite3
+from collections import Counter
+from itertools import chain, groupby
+from operator import itemgetter
+import threading
 import subprocess
 import argparse
 from pathlib import Path
+from array import array
+from git_objects import GitRepository, NearestShown, normalize_paths
+
+# Размер блока чтения вывода git log
+READ_CHUNK_SIZE = 1 << 16
+# Маркер начала записи коммита в выводе git log -z
+COMMIT_MARKER = "\x01"
+# Имя файла кэша коммитов внутри каталога .git анализируемого репозитория
+CACHE_FILE_NAME = "dependency_visualizer.sqlite"
+# Версия схемы кэша; кэш другой версии пересоздаётся
+CACHE_VERSION = 4
+# Содержимое результата, если файл не найден в истории
+EMPTY_GRAPH = "Граф зависимостей пуст или файл не найден."
+# Коммиты с большим числом файлов (массовые правки) не учитываются в весах совместных изменений
+COCHANGE_MAX_FILES = 100
+# Форматы ключей интервалов времени для агрегации коммитов
+TIME_BUCKETS = {"day": "%Y-%m-%d", "week": "%G-W%V", "month": "%Y-%m"}
+# Интервал вывода прогресса в секундах
+PROGRESS_INTERVAL = 1.0
+# Суффикс файла состояния для --update, хранящегося рядом с результатом
+STATE_SUFFIX = ".state.json"
 
 def get_git_commits_with_file(repo_path, file_name):
     """
@@ -36,26 +67,874 @@ def get_commit_files(repo_path, commit_hash):
         print(f"Ошибка выполнения git: {e}")
         return []
 
-def build_mermaid_graph(repo_path, file_name):
+def iter_log_records(stream):
+    """
+    Разобрать поток вывода git log --name-only -z на записи (заголовок, файлы).
+    Поток читается блоками, в памяти держится только текущая запись.
+    """
+    commit = None
+    files = []
+    tail = b""
+    while True:
+        chunk = stream.read(READ_CHUNK_SIZE)
+        tokens = (tail + chunk).split(b"\0")
+        # git log -z не завершает NUL последнюю запись: в конце потока остаток
+        # разбирается как обычная лексема (это может быть и заголовок коммита без файлов)
+        tail = tokens.pop() if chunk else b""
+        for token in tokens:
+            if not token:
+                continue
+            text = token.decode("utf-8", "surrogateescape")
+            if text.startswith(COMMIT_MARKER):
+                if commit is not None:
+                    yield commit, files
+                commit, _, first_file = text[1:].partition("\n")
+                files = [first_file] if first_file else []
+            else:
+                files.append(text)
+        if not chunk:
+            break
+    if commit is not None:
+        yield commit, files
+
+def iter_git_log(repo_path, pretty, arguments):
+    """
+    Запустить git log --name-only -z и потоково отдавать записи (заголовок, файлы),
+    где заголовок формируется форматом pretty.
+    """
+    command = [
+        "git", "-C", str(repo_path), "log", "--no-renames", "--cc", "--name-only", "-z",
+        f"--pretty=format:{COMMIT_MARKER}{pretty}", *arguments,
+    ]
+    with subprocess.Popen(command, stdout=subprocess.PIPE) as process:
+        yield from iter_log_records(process.stdout)
+    if process.returncode:
+        print(f"Ошибка выполнения git: {subprocess.CalledProcessError(process.returncode, command)}")
+
+def iter_commit_files(repo_path, file_name):
+    """
+    Получить коммиты, где изменялся указанный файл (или любой из списка путей),
+    вместе с родителями, всеми файлами и временем каждого коммита за один
+    запуск git log: записи (коммит, родители, файлы, время).
+    Родители переписываются git на ближайшие коммиты, также изменявшие файл.
+    """
+    arguments = ["--parents", "--full-diff", "--", *normalize_paths(file_name)]
+    for header, files in iter_git_log(repo_path, "%H %ct %P", arguments):
+        commit, timestamp, *parents = header.split()
+        yield commit, tuple(parents), files, int(timestamp)
+
+def rev_parse(repo_path, revision="HEAD"):
+    """
+    Хэш коммита revision или None, если его нет (например, пустой репозиторий).
+    """
+    result = subprocess.run(["git", "-C", str(repo_path), "rev-parse", "--verify", "-q", f"{revision}^{{commit}}"],
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+def is_ancestor(repo_path, ancestor, commit):
+    """
+    Достижим ли ancestor из commit (история не переписывалась).
+    """
+    result = subprocess.run(["git", "-C", str(repo_path), "merge-base", "--is-ancestor", ancestor, commit],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return result.returncode == 0
+
+def nearest_commit_with_file(repo_path, commit, file_name):
+    """
+    Ближайший к commit (включительно) коммит, изменявший файл, в порядке
+    обхода git log, или None, если такого нет.
+    """
+    result = subprocess.run(["git", "-C", str(repo_path), "log", "-1", "--format=%H", commit,
+                             "--", *normalize_paths(file_name)],
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    return result.stdout.strip() or None
+
+def iter_new_commit_files(repo_path, file_name, head, last_head):
+    """
+    Записи (коммит, родители, файлы, время) коммитов, изменявших файл, которые
+    достижимы из head, но не из last_head. Родителей за границей диапазона git
+    не переписывает: они заменяются ближайшими коммитами старой истории,
+    изменявшими файл, поэтому рёбра совпадают с полным проходом. Работа
+    пропорциональна числу новых коммитов.
+    """
+    arguments = ["--parents", "--full-diff", head, "--not", last_head, "--", *normalize_paths(file_name)]
+    records = []
+    for header, files in iter_git_log(repo_path, "%H %ct %P", arguments):
+        commit, timestamp, *parents = header.split()
+        records.append((commit, parents, files, int(timestamp)))
+    new_commits = {record[0] for record in records}
+    nearest = {}
+    for commit, parents, files, timestamp in records:
+        rewritten = []
+        for parent in parents:
+            if parent not in new_commits:
+                if parent not in nearest:
+                    nearest[parent] = nearest_commit_with_file(repo_path, parent, file_name)
+                parent = nearest[parent]
+            if parent is not None and parent not in rewritten:
+                rewritten.append(parent)
+        yield commit, tuple(rewritten), files, timestamp
+
+def iter_merge_diffs(repo_path, merges):
+    """
+    Файлы, отличающиеся в слияниях от каждого из родителей, за один запуск
+    git diff-tree --stdin. merges - список (слияние, родители); отдаются записи
+    (слияние, номер родителя, файлы).
+    """
+    pairs = [(merge, index, parent) for merge, parents in merges for index, parent in enumerate(parents)]
+    command = [
+        "git", "-C", str(repo_path), "diff-tree", "--stdin", "--no-renames", "-r", "--name-only", "-z",
+        "--always", f"--pretty=format:{COMMIT_MARKER}%H",
+    ]
+
+    def write_pairs(stream):
+        with stream:
+            for merge, _, parent in pairs:
+                stream.write(f"{merge} {parent}\n".encode())
+
+    with subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE) as process:
+        # Пары пишутся из отдельного потока, чтобы git не заблокировался на заполненном выводе
+        writer = threading.Thread(target=write_pairs, args=(process.stdin,))
+        writer.start()
+        # С --always git выводит запись на каждую пару, даже без изменений
+        for (merge, index, _), (_, files) in zip(pairs, iter_log_records(process.stdout)):
+            yield merge, index, files
+        writer.join()
+    if process.returncode:
+        print(f"Ошибка выполнения git: {subprocess.CalledProcessError(process.returncode, command)}")
+
+def open_commit_cache(repo_path):
+    """
+    Открыть кэш коммитов в каталоге .git репозитория.
+    Возвращает (соединение, хэш HEAD) или None, если репозиторий недоступен.
+    """
+    try:
+        result = subprocess.run(
+            ["git", "-C", str(repo_path), "rev-parse", "--absolute-git-dir", "HEAD"],
+            stdout=subprocess.PIPE,
+            text=True,
+            check=True
+        )
+    except subprocess.CalledProcessError as e:
+        print(f"Ошибка выполнения git: {e}")
+        return None
+    git_dir, head = result.stdout.splitlines()
+    connection = sqlite3.connect(os.path.join(git_dir, CACHE_FILE_NAME))
+    try:
+        create_cache_schema(connection)
+    except sqlite3.Error:
+        connection.close()
+        raise
+    return connection, head
+
+def create_cache_schema(connection):
+    """
+    Создать таблицы кэша; кэш другой версии схемы пересоздаётся.
+    """
+    if connection.execute("PRAGMA user_version").fetchone()[0] != CACHE_VERSION:
+        connection.executescript(f"""
+            DROP TABLE IF EXISTS commits;
+            DROP TABLE IF EXISTS files;
+            DROP TABLE IF EXISTS merge_files;
+            DROP TABLE IF EXISTS tips;
+            PRAGMA user_version = {CACHE_VERSION};
+        """)
+    # Коммиты каждого обновления кэша (batch) хранятся в порядке git log,
+    # более поздние обновления содержат более новые коммиты.
+    # Для слияний дополнительно хранятся отличия от каждого из родителей
+    connection.executescript("""
+        CREATE TABLE IF NOT EXISTS commits (
+            id INTEGER PRIMARY KEY,
+            hash TEXT NOT NULL UNIQUE,
+            parents TEXT NOT NULL,
+            time INTEGER NOT NULL,
+            batch INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS files (
+            commit_id INTEGER NOT NULL,
+            path TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS files_path ON files (path);
+        CREATE INDEX IF NOT EXISTS files_commit ON files (commit_id);
+        CREATE TABLE IF NOT EXISTS merge_files (
+            commit_id INTEGER NOT NULL,
+            parent_index INTEGER NOT NULL,
+            path TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS merge_files_path ON merge_files (path);
+        CREATE TABLE IF NOT EXISTS tips (
+            hash TEXT PRIMARY KEY
+        );
+    """)
+
+def refresh_commit_cache(connection, repo_path, head):
+    """
+    Дописать в кэш коммиты, достижимые из head и отсутствующие в кэше.
+    Git запрашивается только о коммитах новее уже закэшированных вершин.
+    Возвращает число добавленных коммитов.
+    """
+    tips = [row[0] for row in connection.execute("SELECT hash FROM tips")]
+    if head in tips:
+        return 0
+    batch = connection.execute("SELECT COALESCE(MAX(batch), 0) + 1 FROM commits").fetchone()[0]
+    added = 0
+    merges = []
+    merge_ids = {}
+    with connection:
+        for header, files in iter_git_log(repo_path, "%H %ct %P", ["--ignore-missing", head, "--not", *tips]):
+            commit, timestamp, *parents = header.split()
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO commits (hash, parents, time, batch) VALUES (?, ?, ?, ?)",
+                (commit, " ".join(parents), int(timestamp), batch)
+            )
+            if not cursor.rowcount:
+                continue
+            connection.executemany(
+                "INSERT INTO files (commit_id, path) VALUES (?, ?)",
+                ((cursor.lastrowid, path) for path in files)
+            )
+            if len(parents) > 1:
+                merges.append((commit, parents))
+                merge_ids[commit] = cursor.lastrowid
+            added += 1
+        for merge, index, files in iter_merge_diffs(repo_path, merges):
+            connection.executemany(
+                "INSERT INTO merge_files (commit_id, parent_index, path) VALUES (?, ?, ?)",
+                ((merge_ids[merge], index, path) for path in files)
+            )
+        connection.execute("INSERT OR IGNORE INTO tips (hash) VALUES (?)", (head,))
+    return added
+
+def load_parents(connection):
+    """
+    Родители всех коммитов кэша: словарь хэш -> кортеж хэшей.
+    """
+    return {commit: tuple(parents.split()) for commit, parents in connection.execute("SELECT hash, parents FROM commits")}
+
+def reachable_commits(parents, head):
+    """
+    Множество коммитов кэша, достижимых из head по родительским связям.
+    """
+    reachable = set()
+    stack = [head]
+    while stack:
+        commit = stack.pop()
+        if commit in reachable or commit not in parents:
+            continue
+        reachable.add(commit)
+        stack.extend(parents[commit])
+    return reachable
+
+def path_condition(names):
+    """
+    Условие SQL на столбец path для списка файлов и папок ("." - любой путь).
+    Файлы внутри папки name лежат в диапазоне [name/, name0), так как '0' следует за '/'.
+    """
+    if "." in names:
+        return "1", ()
+    conditions = " OR ".join(["path = ? OR (path >= ? AND path < ?)"] * len(names))
+    parameters = tuple(value for name in names for value in (name, name + "/", name + "0"))
+    return f"({conditions})", parameters
+
+def simplify_merges(connection, parents, condition, parameters):
+    """
+    Упрощение истории как в git log -- path: слияние, совпадающее по пути
+    с одним из родителей, заменяется этим родителем и не показывается.
+    Возвращает (упрощённые родители, показываемые слияния).
+    """
+    changed = set(connection.execute(f"""
+        SELECT c.hash, m.parent_index FROM merge_files m JOIN commits c ON c.id = m.commit_id
+        WHERE {condition}
+    """, parameters))
+    simplified = dict(parents)
+    shown = set()
+    for commit, commit_parents in parents.items():
+        if len(commit_parents) > 1:
+            same = [parent for index, parent in enumerate(commit_parents) if (commit, index) not in changed]
+            if same:
+                simplified[commit] = (same[0],)
+            else:
+                shown.add(commit)
+    return simplified, shown
+
+def iter_cached_commit_files(repo_path, file_name):
+    """
+    Получить коммиты, где изменялся указанный файл (или файлы внутри указанной
+    папки), вместе с родителями и всеми их файлами из кэша, предварительно
+    обновив его. Родители переписываются на ближайшие такие же коммиты.
+    Если кэш нельзя открыть или обновить (каталог только для чтения,
+    заблокированная или повреждённая база), история читается через git log.
+    """
+    connection = None
+    try:
+        opened = open_commit_cache(repo_path)
+        if opened is None:
+            return
+        connection, head = opened
+        refresh_commit_cache(connection, repo_path, head)
+        condition, parameters = path_condition(normalize_paths(file_name))
+        all_parents = load_parents(connection)
+        parents, merges = simplify_merges(connection, all_parents, condition, parameters)
+        # В кэше могут быть коммиты других веток, ранее бывших текущими,
+        # и боковые ветки, отброшенные упрощением слияний
+        reachable = reachable_commits(parents, head)
+        matching = f"""
+            (c.id IN (SELECT commit_id FROM files WHERE {condition})
+             OR c.id IN (SELECT commit_id FROM merge_files WHERE {condition}))
+        """
+        # Сначала выбираются только хэши показываемых коммитов (нужны для
+        # переписывания родителей), затем файлы читаются потоком
+        shown = {
+            commit for commit, in connection.execute(f"SELECT hash FROM commits c WHERE {matching}", parameters * 2)
+            if commit in reachable and (len(all_parents[commit]) < 2 or commit in merges)
+        }
+    except sqlite3.Error as e:
+        if connection is not None:
+            connection.close()
+        print(f"Кэш коммитов недоступен ({e}), история читается через git log.", file=sys.stderr)
+        yield from iter_commit_files(repo_path, file_name)
+        return
+    try:
+        nearest = NearestShown(parents, shown)
+        rows = connection.execute(f"""
+            SELECT c.hash, c.time, f.path FROM commits c LEFT JOIN files f ON f.commit_id = c.id
+            WHERE {matching}
+            ORDER BY c.batch DESC, c.id, f.rowid
+        """, parameters * 2)
+        for (commit, timestamp), group in groupby(rows, key=itemgetter(0, 1)):
+            if commit in shown:
+                files = [path for _, _, path in group if path is not None]
+                yield commit, nearest.rewrite(parents[commit]), files, timestamp
+    finally:
+        connection.close()
+
+def iter_native_commit_files(repo_path, file_name, jobs=1):
+    """
+    То же, что iter_commit_files, но объекты репозитория читаются напрямую
+    из каталога .git, без запуска git. С jobs > 1 списки файлов коммитов
+    считаются пулом процессов.
+    """
+    try:
+        repository = GitRepository(repo_path)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка чтения репозитория: {e}")
+        return
+    try:
+        yield from repository.iter_commit_files(file_name, jobs=jobs)
+    except (KeyError, ValueError, zlib.error) as e:
+        print(f"Ошибка чтения объектов git: {e}")
+    finally:
+        repository.close()
+
+class CommitGraph:
+    """
+    Граф коммитов. Хэши интернируются в целые идентификаторы узлов, рёбра
+    (коммит -> родитель) хранятся двумя массивами идентификаторов, поэтому граф
+    на сотни тысяч коммитов не создаёт по объекту на ребро.
+    """
+    def __init__(self):
+        self.ids = {}
+        self.hashes = []
+        self.files = []
+        self.times = array("q")
+        self.order = array("l")
+        self.edge_sources = array("l")
+        self.edge_targets = array("l")
+
+    def __len__(self):
+        return len(self.order)
+
+    def intern(self, commit):
+        """
+        Идентификатор узла для хэша коммита, новый узел создаётся при первом обращении.
+        """
+        node = self.ids.get(commit)
+        if node is None:
+            node = self.ids[commit] = len(self.hashes)
+            self.hashes.append(commit)
+            self.files.append(None)
+            self.times.append(0)
+        return node
+
+    def add_commit(self, commit, parents, files, timestamp=0):
+        """
+        Добавить коммит с его файлами, временем и рёбрами к родителям.
+        """
+        node = self.intern(commit)
+        self.files[node] = files
+        self.times[node] = timestamp
+        self.order.append(node)
+        for parent in parents:
+            self.edge_sources.append(node)
+            self.edge_targets.append(self.intern(parent))
+        return node
+
+    def edges(self):
+        return zip(self.edge_sources, self.edge_targets)
+
+    def adjacency(self):
+        """
+        Списки родителей каждого узла и число детей каждого узла.
+        """
+        parents = [[] for _ in self.hashes]
+        children = array("l", [0]) * len(self.hashes)
+        for source, target in self.edges():
+            parents[source].append(target)
+            children[target] += 1
+        return parents, children
+
+def iter_with_progress(records, stream=sys.stderr):
+    """
+    Пропустить записи, выводя в stream число обработанных коммитов и скорость
+    не чаще раза в PROGRESS_INTERVAL секунд и итог в конце.
+    """
+    start = last = time.perf_counter()
+    count = 0
+    for record in records:
+        count += 1
+        now = time.perf_counter()
+        if now - last >= PROGRESS_INTERVAL:
+            print(f"Обработано коммитов: {count} ({count / (now - start):.1f} в секунду)", file=stream)
+            last = now
+        yield record
+    elapsed = time.perf_counter() - start
+    print(f"Всего коммитов: {count} за {elapsed:.2f} с ({count / elapsed if elapsed else 0:.1f} в секунду)", file=stream)
+
+def build_commit_graph(records):
+    """
+    Построить граф из записей (коммит, родители, файлы, время).
+    """
+    graph = CommitGraph()
+    for commit, parents, files, timestamp in records:
+        graph.add_commit(commit, parents, files, timestamp)
+    return graph
+
+def coalesce_groups(graph):
+    """
+    Группы узлов, где цепочки подряд идущих коммитов с одинаковым набором
+    файлов объединены: родитель присоединяется к группе коммита, если он
+    единственный родитель и у него нет других детей.
+    """
+    parents, children = graph.adjacency()
+    group_of = {}
+    groups = []
+    for node in graph.order:
+        if node in group_of:
+            continue
+        group = [node]
+        group_of[node] = len(groups)
+        groups.append(group)
+        current = node
+        while len(parents[current]) == 1:
+            parent = parents[current][0]
+            if (parent in group_of or graph.files[parent] is None or children[parent] != 1
+                    or set(graph.files[parent]) != set(graph.files[current])):
+                break
+            group.append(parent)
+            group_of[parent] = group_of[node]
+            current = parent
+    return groups
+
+def bucket_groups(graph, bucket):
+    """
+    Группы узлов по интервалам времени (день, неделя или месяц по UTC).
+    Возвращает группы и подписи интервалов; подписи упорядочены по времени
+    и при сравнении строк.
+    """
+    group_of = {}
+    groups = []
+    keys = []
+    for node in graph.order:
+        key = time.strftime(TIME_BUCKETS[bucket], time.gmtime(graph.times[node]))
+        if key not in group_of:
+            group_of[key] = len(groups)
+            groups.append([])
+            keys.append(key)
+        groups[group_of[key]].append(node)
+    return groups, keys
+
+def sample_groups(group_parents, max_nodes):
+    """
+    Оставить не больше max_nodes групп, равномерно по порядку истории;
+    рёбра переписываются на ближайшие оставленные группы-предки.
+    """
+    count = len(group_parents)
+    if count <= max_nodes:
+        return list(range(count)), group_parents
+    kept = sorted({round(i * (count - 1) / max(max_nodes - 1, 1)) for i in range(max_nodes)})
+    kept_set = set(kept)
+    nearest = NearestShown(dict(enumerate(group_parents)), kept_set)
+    return kept, [nearest.rewrite(group_parents[group]) if group in kept_set else () for group in range(count)]
+
+def reduce_graph(graph, coalesce=False, bucket=None, max_nodes=None):
+    """
+    Уменьшить граф: объединить цепочки с одинаковыми файлами (coalesce),
+    агрегировать коммиты по интервалам времени (bucket) и оставить не больше
+    max_nodes узлов. Возвращает записи (коммит, родители, файлы, время) для
+    узлов-групп и подписи групп из нескольких коммитов.
+    """
+    keys = None
+    if bucket:
+        groups, keys = bucket_groups(graph, bucket)
+    elif coalesce:
+        groups = coalesce_groups(graph)
+    else:
+        groups = [[node] for node in graph.order]
+    group_of = {node: index for index, group in enumerate(groups) for node in group}
+    parents, _ = graph.adjacency()
+    group_parents = []
+    for index, group in enumerate(groups):
+        targets = []
+        for node in group:
+            for parent in parents[node]:
+                target = group_of.get(parent)
+                if target is None or target == index or target in targets:
+                    continue
+                # Время коммиттера не всегда растёт от родителя к потомку (сбитые часы,
+                # rebase): рёбра к более поздним интервалам дали бы циклы, их отбрасываем
+                if keys and keys[target] > keys[index]:
+                    continue
+                targets.append(target)
+        group_parents.append(tuple(targets))
+    kept, group_parents = sample_groups(group_parents, max_nodes) if max_nodes else (range(len(groups)), group_parents)
+
+    records = []
+    titles = {}
+    for index in kept:
+        group = groups[index]
+        commit = graph.hashes[group[0]]
+        files = list(dict.fromkeys(path for node in group for path in graph.files[node]))
+        parent_commits = tuple(graph.hashes[groups[parent][0]] for parent in group_parents[index])
+        records.append((commit, parent_commits, files, graph.times[group[0]]))
+        if keys:
+            titles[commit] = f"{keys[index]} (коммитов: {len(group)})"
+        elif len(group) > 1:
+            titles[commit] = f"{commit[:7]}..{graph.hashes[group[-1]][:7]} (коммитов: {len(group)})"
+    return records, titles
+
+class MermaidWriter:
+    """
+    Потоковая запись графа в формате Mermaid: узел коммита и рёбра к его
+    родителям пишутся в поток сразу по поступлении коммита. Идентификатор
+    узла - полный хэш: короткие префиксы на больших историях совпадают и
+    склеили бы разные коммиты. Подпись узла - короткий хэш (или подпись
+    группы из titles) и не больше max_label_files файлов.
+    """
+    def __init__(self, stream, max_label_files=None, titles=None):
+        self.stream = stream
+        self.max_label_files = max_label_files
+        self.titles = titles or {}
+
+    def title(self, commit):
+        return self.titles.get(commit, commit[:7])
+
+    def label_files(self, files):
+        limit = self.max_label_files
+        if limit is None or len(files) <= limit:
+            return files
+        return files[:limit] + [f"... и ещё {len(files) - limit}"]
+
+    def begin(self):
+        self.stream.write("graph TD\n")
+
+    def commit(self, commit, parents, files):
+        label = f"{self.title(commit)}: {'<br>'.join(self.label_files(files))}".replace('"', "#quot;")
+        self.stream.write(f"{commit}[\"{label}\"]\n")
+        for parent in parents:
+            self.stream.write(f"{commit} --> {parent}\n")
+
+    def end(self):
+        pass
+
+    def empty(self):
+        self.stream.write(f"{EMPTY_GRAPH}\n")
+
+class DotWriter(MermaidWriter):
+    """
+    Потоковая запись графа в формате Graphviz DOT.
+    """
+    @staticmethod
+    def quote(text):
+        escaped = text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        return f'"{escaped}"'
+
+    def begin(self):
+        self.stream.write("digraph dependencies {\n")
+
+    def commit(self, commit, parents, files):
+        node = self.quote(commit)
+        label = self.quote(f"{self.title(commit)}: " + "\n".join(self.label_files(files)))
+        self.stream.write(f"  {node} [label={label}];\n")
+        for parent in parents:
+            self.stream.write(f"  {node} -> {self.quote(parent)};\n")
+
+    def end(self):
+        self.stream.write("}\n")
+
+    def empty(self):
+        self.begin()
+        self.end()
+
+class JsonLinesWriter(MermaidWriter):
+    """
+    Потоковая запись графа в формате JSON Lines: по объекту на коммит.
+    Списки файлов не сокращаются, подпись группы пишется в поле title.
+    """
+    def begin(self):
+        pass
+
+    def commit(self, commit, parents, files):
+        record = {"commit": commit, "parents": list(parents), "files": files}
+        if commit in self.titles:
+            record["title"] = self.titles[commit]
+        self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def empty(self):
+        pass
+
+GRAPH_WRITERS = {
+    "mermaid": MermaidWriter,
+    "dot": DotWriter,
+    "jsonl": JsonLinesWriter,
+}
+
+def iter_records(repo_path, file_name, use_cache=False, native=False, jobs=1, progress=False):
+    """
+    Записи (коммит, родители, файлы, время) для файла из выбранного источника:
+    кэша в каталоге .git (use_cache), прямого чтения объектов (native, jobs
+    процессов) или git log. С progress в stderr выводится ход обработки.
+    """
+    if native:
+        records = iter_native_commit_files(repo_path, file_name, jobs)
+    elif use_cache:
+        records = iter_cached_commit_files(repo_path, file_name)
+    else:
+        records = iter_commit_files(repo_path, file_name)
+    if progress:
+        records = iter_with_progress(records)
+    return records
+
+def write_graph(records, stream, graph_format="mermaid", max_label_files=None, titles=None):
+    """
+    Записать граф в поток в формате graph_format по мере поступления записей.
+    Память не зависит от размера графа. Возвращает число записанных коммитов.
+    """
+    writer = GRAPH_WRITERS[graph_format](stream, max_label_files, titles)
+    count = 0
+    for commit, parents, files, _ in records:
+        if not count:
+            writer.begin()
+        writer.commit(commit, parents, files)
+        count += 1
+    if count:
+        writer.end()
+    else:
+        writer.empty()
+    return count
+
+def build_mermaid_graph(repo_path, file_name, use_cache=False, native=False, jobs=1, progress=False):
     """
     Построить граф зависимостей в формате Mermaid.
+    Рёбра ведут от коммита к родителям среди коммитов, изменявших файл.
+    """
+    output = io.StringIO()
+    write_graph(iter_records(repo_path, file_name, use_cache, native, jobs, progress), output)
+    return output.getvalue().rstrip("\n")
+
+def state_path(output_path):
+    return Path(f"{output_path}{STATE_SUFFIX}")
+
+def read_state(output_path):
+    """
+    Состояние предыдущего запуска с --update или None, если его нет или оно повреждено.
+    """
+    try:
+        with open(state_path(output_path), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_state(output_path, state):
+    with open(state_path(output_path), "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+
+def append_graph(records, output_path, graph_format="mermaid", max_label_files=None):
+    """
+    Дописать узлы и рёбра новых коммитов в конец ранее сохранённого непустого
+    графа; у DOT закрывающая скобка переносится в конец. Новые коммиты
+    оказываются после старых, а не перед ними, как при полном построении.
+    Возвращает число дописанных коммитов.
+    """
+    records = iter(records)
+    first = next(records, None)
+    if first is None:
+        return 0
+    if graph_format == "dot":
+        with open(output_path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(f.tell() - 2, 0))
+            if f.read() == b"}\n":
+                f.seek(-2, os.SEEK_END)
+                f.truncate()
+    count = 0
+    with open(output_path, "a", encoding="utf-8") as f:
+        writer = GRAPH_WRITERS[graph_format](f, max_label_files)
+        for commit, parents, files, _ in chain([first], records):
+            writer.commit(commit, parents, files)
+            count += 1
+        writer.end()
+    return count
+
+def update_graph(repo_path, file_name, output_path, graph_format="mermaid", max_label_files=None,
+                 use_cache=False, native=False, jobs=1, progress=False):
+    """
+    Инкрементальное обновление графа в output_path (режим --update для хуков CI).
+    Если состояние предыдущего запуска подходит (те же пути и формат, старая
+    вершина достижима из HEAD), в файл дописываются только коммиты, появившиеся
+    после неё; иначе граф строится заново. Возвращает (число записанных коммитов,
+    был ли граф дописан).
+    """
+    head = rev_parse(repo_path)
+    # node_ids: графы с узлами по коротким хэшам не дописываются, а строятся заново
+    options = {"files": list(normalize_paths(file_name)), "format": graph_format, "max_label_files": max_label_files,
+               "node_ids": "full"}
+    state = read_state(output_path)
+    appendable = (state is not None and state.get("options") == options and state.get("commits")
+                  and Path(output_path).is_file() and head is not None
+                  and is_ancestor(repo_path, state["head"], head))
+    count = 0
+    if appendable:
+        if state["head"] != head:
+            records = iter_new_commit_files(repo_path, file_name, head, state["head"])
+            if progress:
+                records = iter_with_progress(records)
+            count = append_graph(records, output_path, graph_format, max_label_files)
+        total = state["commits"] + count
+    else:
+        records = iter_records(repo_path, file_name, use_cache, native, jobs, progress) if head else iter(())
+        with open(output_path, "w", encoding="utf-8") as f:
+            count = write_graph(records, f, graph_format, max_label_files)
+        total = count
+    write_state(output_path, {"head": head, "options": options, "commits": total})
+    return count, bool(appendable)
+
+def path_selected(path, names):
+    """
+    Проверить, что путь совпадает с одним из файлов names или лежит внутри одной из папок.
     """
-    commits = get_git_commits_with_file(repo_path, file_name)
-    if not commits:
-        return "Граф зависимостей пуст или файл не найден."
+    return any(name == "." or path == name or path.startswith(name + "/") for name in names)
 
-    graph = ["graph TD"]
-    previous_commit = None
+class CoChangeIndex:
+    """
+    Индекс совместных изменений файлов за один проход истории. Файлы и коммиты
+    интернируются в целые идентификаторы; обратный индекс файл -> коммиты
+    позволяет отвечать на запросы по файлу за время, пропорциональное числу
+    коммитов, изменявших этот файл.
+    """
+    def __init__(self, max_files=COCHANGE_MAX_FILES):
+        self.max_files = max_files
+        self.file_ids = {}
+        self.paths = []
+        self.file_commits = []
+        self.commits = []
+        self.commit_files = []
+
+    def intern(self, path):
+        file_id = self.file_ids.get(path)
+        if file_id is None:
+            file_id = self.file_ids[path] = len(self.paths)
+            self.paths.append(path)
+            self.file_commits.append(array("l"))
+        return file_id
+
+    def add_commit(self, commit, files):
+        commit_id = len(self.commits)
+        self.commits.append(commit)
+        file_ids = array("l", sorted({self.intern(path) for path in files}))
+        self.commit_files.append(file_ids)
+        for file_id in file_ids:
+            self.file_commits[file_id].append(commit_id)
+
+    def commits_of(self, path):
+        """
+        Хэши коммитов, изменявших файл, в порядке истории.
+        """
+        file_id = self.file_ids.get(path)
+        if file_id is None:
+            return []
+        return [self.commits[commit_id] for commit_id in self.file_commits[file_id]]
 
-    for commit in commits:
-        files = get_commit_files(repo_path, commit)
-        node_label = f"{commit[:7]}: {'<br>'.join(files)}"
-        graph.append(f"{commit[:7]}[\"{node_label}\"]")
-        if previous_commit:
-            graph.append(f"{previous_commit[:7]} --> {commit[:7]}")
-        previous_commit = commit
+    def cochanged(self, path):
+        """
+        Счётчик файл -> число коммитов, в которых он менялся вместе с path.
+        """
+        file_id = self.file_ids.get(path)
+        if file_id is None:
+            return Counter()
+        return Counter({self.paths[other]: weight for other, weight in self.neighbours(file_id).items()})
+
+    def neighbours(self, file_id):
+        counter = Counter()
+        for commit_id in self.file_commits[file_id]:
+            file_ids = self.commit_files[commit_id]
+            if len(file_ids) <= self.max_files:
+                counter.update(file_ids)
+        del counter[file_id]
+        return counter
+
+    def iter_edges(self, min_weight=1):
+        """
+        Рёбра графа совместных изменений (файл, файл, вес), каждое один раз.
+        """
+        for file_id in range(len(self.paths)):
+            for other, weight in sorted(self.neighbours(file_id).items()):
+                if other > file_id and weight >= min_weight:
+                    yield file_id, other, weight
+
+def build_cochange_index(records, file_name, max_files=COCHANGE_MAX_FILES):
+    """
+    Построить индекс совместных изменений по записям истории для файлов,
+    совпадающих с file_name или лежащих внутри его папок (file_name может быть списком).
+    """
+    names = normalize_paths(file_name)
+    index = CoChangeIndex(max_files)
+    for commit, _, files, _ in records:
+        selected = [path for path in files if path_selected(path, names)]
+        if selected:
+            index.add_commit(commit, selected)
+    return index
 
-    return "\n".join(graph)
+def write_cochange_graph(index, stream, graph_format="mermaid", min_weight=1):
+    """
+    Записать граф совместных изменений в поток: узлы - файлы, вес ребра -
+    число коммитов, в которых файлы менялись вместе.
+    """
+    if graph_format == "jsonl":
+        for file_id, path in enumerate(index.paths):
+            stream.write(json.dumps({"file": path, "commits": len(index.file_commits[file_id])},
+                                    ensure_ascii=False) + "\n")
+        for source, target, weight in index.iter_edges(min_weight):
+            stream.write(json.dumps({"source": index.paths[source], "target": index.paths[target],
+                                     "weight": weight}, ensure_ascii=False) + "\n")
+    elif graph_format == "dot":
+        quote = DotWriter.quote
+        stream.write("graph cochange {\n")
+        for path in index.paths:
+            stream.write(f"  {quote(path)};\n")
+        for source, target, weight in index.iter_edges(min_weight):
+            stream.write(f"  {quote(index.paths[source])} -- {quote(index.paths[target])} "
+                         f"[weight={weight}, label={weight}];\n")
+        stream.write("}\n")
+    else:
+        if not index.paths:
+            stream.write(f"{EMPTY_GRAPH}\n")
+            return
+        stream.write("graph LR\n")
+        for file_id, path in enumerate(index.paths):
+            label = path.replace('"', "#quot;")
+            stream.write(f"f{file_id}[\"{label}\"]\n")
+        for source, target, weight in index.iter_edges(min_weight):
+            stream.write(f"f{source} ---|{weight}| f{target}\n")
 
 def save_graph_to_file(graph, output_path):
     """
@@ -70,21 +949,88 @@ def save_graph_to_file(graph, output_path):
 def main():
     parser = argparse.ArgumentParser(description="Визуализация графа зависимостей для git-репозитория.")
     parser.add_argument("--repo-path", required=True, help="Путь к анализируемому репозиторию.")
-    parser.add_argument("--file-name", required=True, help="Имя файла для анализа зависимостей.")
-    parser.add_argument("--output-path", required=True, help="Путь к файлу-результату в формате Mermaid.")
+    parser.add_argument("--file-name", nargs="+", default=[],
+                        help="Имена файлов или папок для анализа зависимостей.")
+    parser.add_argument("--files-from", help="Файл со списком путей для анализа, по одному в строке.")
+    parser.add_argument("--cochange", action="store_true",
+                        help="Построить граф совместных изменений файлов вместо графа коммитов.")
+    parser.add_argument("--min-weight", type=int, default=1,
+                        help="Минимальное число общих коммитов для ребра графа совместных изменений.")
+    parser.add_argument("--max-commit-files", type=int, default=COCHANGE_MAX_FILES,
+                        help="Коммиты с большим числом файлов не учитываются в графе совместных изменений.")
+    parser.add_argument("--output-path", required=True, help="Путь к файлу-результату.")
+    parser.add_argument("--format", choices=list(GRAPH_WRITERS), default="mermaid",
+                        help="Формат результата: Mermaid, Graphviz DOT или JSON Lines.")
+    parser.add_argument("--max-label-files", type=int,
+                        help="Показывать в подписи узла не больше указанного числа файлов.")
+    parser.add_argument("--coalesce", action="store_true",
+                        help="Объединять цепочки подряд идущих коммитов с одинаковым набором файлов.")
+    parser.add_argument("--bucket", choices=list(TIME_BUCKETS),
+                        help="Агрегировать коммиты по интервалам времени.")
+    parser.add_argument("--max-nodes", type=int,
+                        help="Оставить в графе не больше указанного числа узлов (равномерная выборка).")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Не использовать кэш списков файлов коммитов в каталоге .git.")
+    parser.add_argument("--native", action="store_true",
+                        help="Читать объекты репозитория напрямую, без запуска git (кэш не используется).")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Число процессов для вычисления файлов коммитов; только с --native "
+                             "(git log и кэш читаются в одном процессе).")
+    parser.add_argument("--progress", action="store_true", help="Выводить ход обработки коммитов в stderr.")
+    parser.add_argument("--update", action="store_true",
+                        help="Дописать в результат только новые коммиты; состояние хранится "
+                             f"в файле <output-path>{STATE_SUFFIX}.")
     
     args = parser.parse_args()
 
+    file_name = list(args.file_name)
+    if args.files_from:
+        with open(args.files_from, encoding="utf-8") as f:
+            file_name.extend(line.strip() for line in f if line.strip())
+    if not file_name:
+        parser.error("укажите --file-name или --files-from")
+    if args.update and (args.cochange or args.coalesce or args.bucket or args.max_nodes):
+        parser.error("--update несовместим с --cochange, --coalesce, --bucket и --max-nodes")
+    if args.jobs > 1 and not args.native:
+        parser.error("--jobs больше 1 работает только с --native")
+
     repo_path = Path(args.repo_path).resolve()
-    file_name = args.file_name
     output_path = Path(args.output_path).resolve()
 
     if not repo_path.is_dir():
         print(f"Указанный путь к репозиторию не найден: {repo_path}")
         return
 
-    graph = build_mermaid_graph(repo_path, file_name)
-    save_graph_to_file(graph, output_path)
+    if args.update:
+        try:
+            count, appended = update_graph(repo_path, file_name, output_path, args.format, args.max_label_files,
+                                           use_cache=not args.no_cache, native=args.native,
+                                           jobs=args.jobs, progress=args.progress)
+        except IOError as e:
+            print(f"Ошибка сохранения графа: {e}")
+            return
+        if appended:
+            print(f"Новых коммитов: {count}. Граф зависимостей дополнен в {output_path}.")
+        else:
+            print(f"Граф зависимостей сохранён в {output_path}.")
+        return
+
+    records = iter_records(repo_path, file_name, use_cache=not args.no_cache, native=args.native,
+                           jobs=args.jobs, progress=args.progress)
+    try:
+        with open(output_path, "w", encoding="utf-8") as f:
+            if args.cochange:
+                index = build_cochange_index(records, file_name, args.max_commit_files)
+                write_cochange_graph(index, f, args.format, args.min_weight)
+            elif args.coalesce or args.bucket or args.max_nodes:
+                # Объединение и выборка требуют всего графа в памяти
+                reduced, titles = reduce_graph(build_commit_graph(records), args.coalesce, args.bucket, args.max_nodes)
+                write_graph(reduced, f, args.format, args.max_label_files, titles)
+            else:
+                write_graph(records, f, args.format, args.max_label_files)
+    except IOError as e:
+        print(f"Ошибка сохранения графа: {e}")
+        return
     print(f"Граф зависимостей сохранён в {output_path}.")
 
 if __name__ == "__main__":
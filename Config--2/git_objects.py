@@ -0,0 +1,562 @@
+import os
+import re
+import zlib
+import mmap
+import heapq
+import struct
+import posixpath
+from operator import itemgetter
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Типы объектов в pack-файле
+OBJ_COMMIT = 1
+OBJ_TREE = 2
+OBJ_BLOB = 3
+OBJ_TAG = 4
+OBJ_OFS_DELTA = 6
+OBJ_REF_DELTA = 7
+TYPE_NAMES = {OBJ_COMMIT: "commit", OBJ_TREE: "tree", OBJ_BLOB: "blob", OBJ_TAG: "tag"}
+
+# Режим записи дерева, указывающей на поддерево
+TREE_MODE = b"40000"
+# Число разобранных деревьев и баз дельт, хранимых в памяти
+TREE_CACHE_SIZE = 4096
+DELTA_CACHE_SIZE = 256
+# Число коммитов в одной задаче пула и число задач в работе на процесс
+JOB_CHUNK_SIZE = 64
+JOBS_IN_FLIGHT = 4
+# Размер окна сжатых данных при распаковке объекта из pack-файла
+INFLATE_WINDOW = 1 << 16
+# Запись дерева: режим, имя и двоичный хэш
+TREE_ENTRY = re.compile(rb"(\d+) ([^\0]*)\0(.{20})", re.S)
+# Хэш пустого дерева: путь "." в нём отсутствует, как и в коммите без файлов
+EMPTY_TREE = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+# Ссылки, которые у каждого рабочего дерева свои; остальные лежат в общем каталоге
+WORKTREE_REF_PREFIXES = ("refs/bisect/", "refs/worktree/", "refs/rewritten/")
+
+def normalize_paths(file_name):
+    """
+    Список нормализованных путей из имени файла или папки либо из списка имён.
+    "." означает весь репозиторий.
+    """
+    names = [file_name] if isinstance(file_name, (str, os.PathLike)) else file_name
+    return [posixpath.normpath(os.fspath(name)).strip("/") or "." for name in names]
+
+def apply_delta(base, delta):
+    """
+    Применить git-дельту к базовому объекту.
+    """
+    pos = 0
+    # Размеры исходного и результирующего объектов в формате varint
+    for _ in range(2):
+        while delta[pos] & 0x80:
+            pos += 1
+        pos += 1
+    result = bytearray()
+    while pos < len(delta):
+        op = delta[pos]
+        pos += 1
+        if op & 0x80:
+            offset = size = 0
+            for i in range(4):
+                if op & (1 << i):
+                    offset |= delta[pos] << (8 * i)
+                    pos += 1
+            for i in range(3):
+                if op & (0x10 << i):
+                    size |= delta[pos] << (8 * i)
+                    pos += 1
+            result += base[offset:offset + (size or 0x10000)]
+        elif op:
+            result += delta[pos:pos + op]
+            pos += op
+        else:
+            raise ValueError("Некорректная команда дельты")
+    return bytes(result)
+
+class PackFile:
+    """
+    Pack-файл с индексом версии 2. Оба файла отображаются в память через mmap,
+    поиск объекта - двоичный поиск по таблице хэшей индекса.
+    """
+    def __init__(self, idx_path):
+        with open(idx_path, "rb") as f:
+            self.index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(idx_path[:-len(".idx")] + ".pack", "rb") as f:
+            self.pack = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.index[:8] != b"\377tOc\0\0\0\2":
+            raise ValueError(f"Неподдерживаемый формат индекса: {idx_path}")
+        self.fanout = struct.unpack_from(">256I", self.index, 8)
+        self.count = self.fanout[255]
+        self.names_offset = 8 + 256 * 4
+        self.offsets_offset = self.names_offset + self.count * (20 + 4)
+        self.large_offsets_offset = self.offsets_offset + self.count * 4
+        self.bases = OrderedDict()
+
+    def find(self, sha):
+        """
+        Смещение объекта с двоичным хэшем sha в pack-файле или None.
+        """
+        low = self.fanout[sha[0] - 1] if sha[0] else 0
+        high = self.fanout[sha[0]]
+        while low < high:
+            middle = (low + high) // 2
+            start = self.names_offset + middle * 20
+            name = self.index[start:start + 20]
+            if name < sha:
+                low = middle + 1
+            elif name > sha:
+                high = middle
+            else:
+                offset, = struct.unpack_from(">I", self.index, self.offsets_offset + middle * 4)
+                if offset & 0x80000000:
+                    position = self.large_offsets_offset + (offset & 0x7fffffff) * 8
+                    offset, = struct.unpack_from(">Q", self.index, position)
+                return offset
+        return None
+
+    def inflate(self, pos, size):
+        """
+        Распаковать объект размера size, начинающийся в pack-файле с позиции pos.
+        Сжатые данные подаются окнами: при передаче всего хвоста pack-файла zlib
+        копировал бы его в unconsumed_tail.
+        """
+        view = memoryview(self.pack)
+        decompressor = zlib.decompressobj()
+        window = size + 64
+        parts = []
+        while not decompressor.eof:
+            chunk = view[pos:pos + window]
+            if not chunk:
+                raise ValueError("Неожиданный конец pack-файла")
+            parts.append(decompressor.decompress(chunk))
+            pos += window
+            window = INFLATE_WINDOW
+        return b"".join(parts)
+
+    def read_header(self, offset):
+        """
+        Разобрать заголовок объекта: (тип, размер, смещение данных, база дельты).
+        База - смещение для OFS_DELTA или двоичный хэш для REF_DELTA.
+        """
+        pack = self.pack
+        pos = offset
+        byte = pack[pos]
+        kind = (byte >> 4) & 7
+        size = byte & 15
+        shift = 4
+        while byte & 0x80:
+            pos += 1
+            byte = pack[pos]
+            size |= (byte & 0x7f) << shift
+            shift += 7
+        pos += 1
+        base = None
+        if kind == OBJ_OFS_DELTA:
+            byte = pack[pos]
+            pos += 1
+            distance = byte & 0x7f
+            while byte & 0x80:
+                byte = pack[pos]
+                pos += 1
+                distance = ((distance + 1) << 7) | (byte & 0x7f)
+            base = offset - distance
+        elif kind == OBJ_REF_DELTA:
+            base = pack[pos:pos + 20]
+            pos += 20
+        return kind, size, pos, base
+
+    def read(self, offset, store):
+        """
+        Прочитать объект по смещению, разворачивая цепочку дельт.
+        Возвращает (тип, данные). Базы REF_DELTA ищутся через store.
+        """
+        deltas = []
+        while True:
+            if offset in self.bases:
+                self.bases.move_to_end(offset)
+                kind, data = self.bases[offset]
+                break
+            kind, size, pos, base = self.read_header(offset)
+            if kind == OBJ_OFS_DELTA:
+                deltas.append((offset, self.inflate(pos, size)))
+                offset = base
+            elif kind == OBJ_REF_DELTA:
+                deltas.append((offset, self.inflate(pos, size)))
+                kind, data = store.read_object(base.hex())
+                kind = {name: number for number, name in TYPE_NAMES.items()}[kind]
+                break
+            else:
+                data = self.inflate(pos, size)
+                break
+        for delta_offset, delta in reversed(deltas):
+            data = apply_delta(data, delta)
+            # Базы дельт переиспользуются соседними объектами цепочек
+            self.bases[delta_offset] = (kind, data)
+            if len(self.bases) > DELTA_CACHE_SIZE:
+                self.bases.popitem(last=False)
+        return TYPE_NAMES[kind], data
+
+    def close(self):
+        self.index.close()
+        self.pack.close()
+
+class GitRepository:
+    """
+    Чтение объектов git-репозитория без запуска git: loose-объекты
+    и pack-файлы из каталога objects и каталогов из objects/info/alternates.
+    """
+    def __init__(self, repo_path):
+        self.repo_path = str(repo_path)
+        self.git_dir = self.find_git_dir(self.repo_path)
+        self.common_dir = self.find_common_dir(self.git_dir)
+        self.object_dirs = self.find_object_dirs(os.path.join(self.common_dir, "objects"))
+        self.packs = []
+        for objects_dir in self.object_dirs:
+            pack_dir = os.path.join(objects_dir, "pack")
+            if os.path.isdir(pack_dir):
+                for name in sorted(os.listdir(pack_dir)):
+                    if name.endswith(".idx") and os.path.exists(os.path.join(pack_dir, name[:-4] + ".pack")):
+                        self.packs.append(PackFile(os.path.join(pack_dir, name)))
+        self.trees = OrderedDict()
+        self.commits = {}
+
+    @staticmethod
+    def find_git_dir(repo_path):
+        """
+        Каталог git: .git внутри рабочей копии, каталог из файла .git
+        (рабочие деревья и подмодули) или сам repo_path для bare-репозитория.
+        """
+        dot_git = os.path.join(repo_path, ".git")
+        if os.path.isdir(dot_git):
+            return dot_git
+        if os.path.isfile(dot_git):
+            with open(dot_git, encoding="utf-8") as f:
+                content = f.read().strip()
+            if content.startswith("gitdir:"):
+                return os.path.join(repo_path, content[len("gitdir:"):].strip())
+        if os.path.isdir(os.path.join(repo_path, "objects")):
+            return repo_path
+        raise FileNotFoundError(f"Не найден каталог git в {repo_path}")
+
+    @staticmethod
+    def find_common_dir(git_dir):
+        """
+        Общий каталог репозитория: у связанного рабочего дерева объекты и
+        общие ссылки лежат в каталоге из файла commondir, иначе - сам git_dir.
+        """
+        path = os.path.join(git_dir, "commondir")
+        if not os.path.isfile(path):
+            return git_dir
+        with open(path, encoding="utf-8") as f:
+            return os.path.join(git_dir, f.read().strip())
+
+    @staticmethod
+    def find_object_dirs(objects_dir):
+        """
+        Каталог объектов и, рекурсивно, каталоги из objects/info/alternates
+        (пути в нём относительны каталога объектов).
+        """
+        dirs = []
+        pending = [objects_dir]
+        while pending:
+            path = os.path.normpath(pending.pop(0))
+            if path in dirs:
+                continue
+            dirs.append(path)
+            alternates = os.path.join(path, "info", "alternates")
+            if os.path.isfile(alternates):
+                with open(alternates, encoding="utf-8") as f:
+                    pending.extend(os.path.join(path, line.strip()) for line in f
+                                   if line.strip() and not line.startswith("#"))
+        return dirs
+
+    def close(self):
+        for pack in self.packs:
+            pack.close()
+        self.packs = []
+
+    def read_object(self, sha):
+        """
+        Прочитать объект по шестнадцатеричному хэшу. Возвращает (тип, данные).
+        """
+        for objects_dir in self.object_dirs:
+            path = os.path.join(objects_dir, sha[:2], sha[2:])
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    raw = zlib.decompress(f.read())
+                header, _, data = raw.partition(b"\0")
+                return header.split(b" ")[0].decode(), data
+        binary = bytes.fromhex(sha)
+        for pack in self.packs:
+            offset = pack.find(binary)
+            if offset is not None:
+                return pack.read(offset, self)
+        raise KeyError(f"Объект не найден: {sha}")
+
+    def read_ref(self, name):
+        """
+        Хэш коммита, на который указывает ссылка (HEAD, refs/heads/...), или None.
+        HEAD и ссылки рабочего дерева читаются из git_dir, остальные - из общего каталога.
+        """
+        for _ in range(10):
+            per_worktree = "/" not in name or name.startswith(WORKTREE_REF_PREFIXES)
+            path = os.path.join(self.git_dir if per_worktree else self.common_dir, name)
+            value = None
+            if os.path.isfile(path):
+                with open(path, encoding="utf-8") as f:
+                    value = f.read().strip()
+            else:
+                value = self.read_packed_ref(name)
+            if value is None:
+                return None
+            if not value.startswith("ref:"):
+                return value
+            name = value[len("ref:"):].strip()
+        return None
+
+    def read_packed_ref(self, name):
+        path = os.path.join(self.common_dir, "packed-refs")
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.startswith(("#", "^")):
+                    continue
+                sha, _, ref = line.strip().partition(" ")
+                if ref == name:
+                    return sha
+        return None
+
+    def read_commit(self, sha):
+        """
+        Разобрать коммит: (дерево, список родителей, время коммиттера).
+        """
+        if sha in self.commits:
+            return self.commits[sha]
+        kind, data = self.read_object(sha)
+        while kind == "tag":
+            sha = data.split(b"\n", 1)[0].split(b" ")[1].decode()
+            kind, data = self.read_object(sha)
+        tree = None
+        parents = []
+        timestamp = 0
+        for line in data.split(b"\n"):
+            if not line:
+                break
+            key, _, value = line.partition(b" ")
+            if key == b"tree":
+                tree = value.decode()
+            elif key == b"parent":
+                parents.append(value.decode())
+            elif key == b"committer":
+                timestamp = int(value.rsplit(b" ", 2)[1])
+        self.commits[sha] = tree, parents, timestamp
+        return self.commits[sha]
+
+    def read_tree(self, sha):
+        """
+        Записи дерева: словарь имя -> (режим, имя, двоичный хэш), имена - bytes.
+        Словарь собирается без цикла на Python, так как деревья больших
+        каталогов разбираются для каждого коммита. Разобранные деревья хранятся
+        в LRU-кэше: соседние коммиты делят большую часть поддеревьев.
+        """
+        if sha in self.trees:
+            self.trees.move_to_end(sha)
+            return self.trees[sha]
+        _, data = self.read_object(sha)
+        found = TREE_ENTRY.findall(data)
+        entries = dict(zip(map(itemgetter(1), found), found))
+        self.trees[sha] = entries
+        if len(self.trees) > TREE_CACHE_SIZE:
+            self.trees.popitem(last=False)
+        return entries
+
+    def path_entry(self, tree, path):
+        """
+        Запись дерева для пути внутри дерева tree или None. Для "." - само
+        дерево, если оно не пустое.
+        """
+        if path == ".":
+            return (TREE_MODE, b".", tree) if tree != EMPTY_TREE else None
+        entry = (TREE_MODE, b".", bytes.fromhex(tree))
+        for part in path.encode("utf-8", "surrogateescape").split(b"/"):
+            if entry[0] != TREE_MODE:
+                return None
+            entry = self.read_tree(entry[2].hex()).get(part)
+            if entry is None:
+                return None
+        return entry
+
+    def paths_entry(self, tree, paths):
+        """
+        Записи дерева для каждого из путей: коммит совпадает с родителем по
+        набору путей, если совпадают все записи.
+        """
+        return tuple(self.path_entry(tree, path) for path in paths)
+
+    def diff_trees(self, old, new, prefix=b""):
+        """
+        Пути файлов, различающихся в деревьях old и new (None - пустое дерево),
+        в порядке git. Совпадающие записи отсеиваются сравнением множеств,
+        совпадающие поддеревья пропускаются по хэшу.
+        """
+        if old == new:
+            return
+        old_entries = self.read_tree(old) if old else {}
+        new_entries = self.read_tree(new) if new else {}
+        # Git сортирует поддеревья так, будто их имя оканчивается на '/'
+        changed = {name for name, _ in old_entries.items() ^ new_entries.items()}
+        changes = {}
+        for side, entries in ((0, old_entries), (1, new_entries)):
+            for name in changed & entries.keys():
+                entry = entries[name]
+                key = name + b"/" if entry[0] == TREE_MODE else name
+                changes.setdefault(key, [None, None])[side] = entry
+        for key in sorted(changes):
+            old_entry, new_entry = changes[key]
+            if old_entry == new_entry:
+                continue
+            name = (old_entry or new_entry)[1]
+            if key.endswith(b"/"):
+                yield from self.diff_trees(old_entry and old_entry[2].hex(), new_entry and new_entry[2].hex(),
+                                           prefix + name + b"/")
+            else:
+                yield (prefix + name).decode("utf-8", "surrogateescape")
+
+    def commit_files(self, tree, parents):
+        """
+        Файлы коммита как в git log --cc --name-only: для обычного коммита -
+        отличия от родителя, для слияния - пути, отличающиеся от всех родителей.
+        """
+        if not parents:
+            return list(self.diff_trees(None, tree))
+        files = list(self.diff_trees(self.read_commit(parents[0])[0], tree))
+        for parent in parents[1:]:
+            changed = set(self.diff_trees(self.read_commit(parent)[0], tree))
+            files = [path for path in files if path in changed]
+        return files
+
+    def iter_commit_files(self, file_name, head="HEAD", jobs=1):
+        """
+        Коммиты, где изменялся файл или папка file_name (или любой из списка
+        путей): записи (коммит, родители, все файлы коммита, время) - то же, что
+        git log --parents --full-diff --cc --name-only -- file_name.
+        Коммиты обходятся от новых к старым по времени коммиттера; слияние,
+        совпадающее по file_name с одним из родителей, заменяется этим родителем.
+        Родители переписываются на ближайших показанных предков, поэтому записи
+        отдаются после обхода. Списки файлов при jobs > 1 считаются пулом процессов.
+        """
+        start = self.read_ref(head)
+        if start is None:
+            raise ValueError(f"Не удалось разрешить {head} в {self.git_dir}")
+        paths = normalize_paths(file_name)
+        seen = {start}
+        queue = [(-self.read_commit(start)[2], 0, start)]
+        counter = 1
+        simplified = {}
+        shown = []
+        while queue:
+            _, _, commit = heapq.heappop(queue)
+            tree, parents, _ = self.read_commit(commit)
+            entry = self.paths_entry(tree, paths)
+            parent_trees = [self.read_commit(parent)[0] for parent in parents]
+            same = [parent for parent, parent_tree in zip(parents, parent_trees)
+                    if self.paths_entry(parent_tree, paths) == entry]
+            if len(parents) > 1 and same:
+                parents = same[:1]
+            simplified[commit] = parents
+            if not same and (parents or any(entry)):
+                shown.append(commit)
+            for parent in parents:
+                if parent not in seen:
+                    seen.add(parent)
+                    heapq.heappush(queue, (-self.read_commit(parent)[2], counter, parent))
+                    counter += 1
+        nearest = NearestShown(simplified, set(shown))
+        tasks = ((self.read_commit(commit)[0], simplified[commit]) for commit in shown)
+        if jobs > 1:
+            files = iter_parallel(commit_files_task, tasks, jobs, self.repo_path)
+        else:
+            files = (self.commit_files(tree, parents) for tree, parents in tasks)
+        for commit, commit_files in zip(shown, files):
+            yield commit, nearest.rewrite(simplified[commit]), commit_files, self.read_commit(commit)[2]
+
+# Репозиторий процесса пула, открывается инициализатором
+worker_repository = None
+
+def init_worker(repo_path):
+    global worker_repository
+    worker_repository = GitRepository(repo_path)
+
+def commit_files_task(chunk):
+    return [worker_repository.commit_files(tree, parents) for tree, parents in chunk]
+
+def iter_parallel(function, tasks, jobs, repo_path):
+    """
+    Выполнить function над задачами в пуле из jobs процессов и отдавать результаты
+    в исходном порядке. Задачи группируются по JOB_CHUNK_SIZE, в работе держится
+    не больше jobs * JOBS_IN_FLIGHT групп, поэтому память не зависит от числа задач.
+    """
+    tasks = iter(tasks)
+    pending = deque()
+    with ProcessPoolExecutor(jobs, initializer=init_worker, initargs=(repo_path,)) as executor:
+        while True:
+            chunk = [task for _, task in zip(range(JOB_CHUNK_SIZE), tasks)]
+            if chunk:
+                pending.append(executor.submit(function, chunk))
+            if pending and (not chunk or len(pending) >= jobs * JOBS_IN_FLIGHT):
+                yield from pending.popleft().result()
+            elif not chunk:
+                break
+
+class NearestShown:
+    """
+    Переписывание родителей при упрощении истории: для скрытого коммита -
+    ближайшие показанные предки, найденные с мемоизацией.
+    """
+    def __init__(self, parents, shown):
+        self.parents = parents
+        self.shown = shown
+        self.nearest = {}
+
+    def resolve(self, commit):
+        nearest = self.nearest
+        # Раскрытые, но ещё не разрешённые узлы - текущий путь обхода
+        visiting = set()
+        stack = [commit]
+        while stack:
+            current = stack[-1]
+            if current in nearest:
+                stack.pop()
+            elif current in self.shown:
+                nearest[current] = (current,)
+                stack.pop()
+            else:
+                parents = self.parents.get(current, ())
+                if current not in visiting:
+                    visiting.add(current)
+                    stack.extend(parent for parent in parents if parent not in nearest and parent not in visiting)
+                    continue
+                # Неразрешённый родитель лежит на текущем пути и замыкает цикл:
+                # ребро к нему отбрасывается, иначе обход не закончится
+                result = []
+                for parent in parents:
+                    for ancestor in nearest.get(parent, ()):
+                        if ancestor not in result:
+                            result.append(ancestor)
+                nearest[current] = tuple(result)
+                stack.pop()
+        return nearest[commit]
+
+    def rewrite(self, parents):
+        """
+        Ближайшие показанные предки для списка родителей, без повторов.
+        """
+        result = []
+        for parent in parents:
+            for ancestor in self.resolve(parent):
+                if ancestor not in result:
+                    result.append(ancestor)
+        return tuple(result)
@@ -1,16 +1,35 @@
+import io
 import os
+import json
 from pathlib import Path
 from subprocess import run, CalledProcessError
+from git_objects import GitRepository, NearestShown
 from dependency_visualizer import (
     get_git_commits_with_file,
     get_commit_files,
+    iter_commit_files,
+    iter_cached_commit_files,
+    iter_native_commit_files,
+    iter_log_records,
+    iter_git_log,
+    iter_merge_diffs,
     build_mermaid_graph,
+    build_commit_graph,
+    write_graph,
+    build_cochange_index,
+    reduce_graph,
+    update_graph,
     save_graph_to_file,
 )
 
 # Путь для тестирования (создаётся временный Git-репозиторий)
 TEST_REPO_PATH = Path("test_repo")
 TARGET_FILE = "target_file.txt"
+# Отдельный репозиторий, история которого начинается с пустого коммита
+EMPTY_ROOT_REPO_PATH = Path("test_repo_empty_root")
+# Связанное рабочее дерево и клон с objects/info/alternates тестового репозитория
+WORKTREE_PATH = Path("test_repo_worktree")
+SHARED_CLONE_PATH = Path("test_repo_shared")
 OUTPUT_FILE = Path("output.mmd")
 
 def run_command(command, cwd=None):
@@ -62,6 +81,16 @@ def test_get_commit_files():
     assert TARGET_FILE in first_commit_files, f"Файл {TARGET_FILE} должен быть в первом коммите"
     print("✅ Passed")
 
+def test_iter_commit_files():
+    """Тест для iter_commit_files."""
+    print("Running test_iter_commit_files...")
+    records = list(iter_commit_files(TEST_REPO_PATH, TARGET_FILE))
+    commits = get_git_commits_with_file(TEST_REPO_PATH, TARGET_FILE)
+    assert [commit for commit, _, _, _ in records] == commits, "Коммиты должны совпадать с git log"
+    for commit, _, files, _ in records:
+        assert files == get_commit_files(TEST_REPO_PATH, commit), f"Файлы коммита {commit} должны совпадать с git show"
+    print("✅ Passed")
+
 def test_build_mermaid_graph():
     """Тест для build_mermaid_graph."""
     print("Running test_build_mermaid_graph...")
@@ -70,6 +99,233 @@ def test_build_mermaid_graph():
     assert len(graph.splitlines()) >= 4, "Граф должен содержать узлы и рёбра"
     print("✅ Passed")
 
+def test_cached_commit_files():
+    """Тест для iter_cached_commit_files: кэш совпадает с git log и дополняется новыми коммитами."""
+    print("Running test_cached_commit_files...")
+    records = list(iter_cached_commit_files(TEST_REPO_PATH, TARGET_FILE))
+    assert records == list(iter_commit_files(TEST_REPO_PATH, TARGET_FILE)), "Кэш должен совпадать с git log"
+    assert (TEST_REPO_PATH / ".git" / "dependency_visualizer.sqlite").exists(), "Кэш должен лежать в каталоге .git"
+
+    with open(TEST_REPO_PATH / "other_file.txt", "w") as f:
+        f.write("Other content")
+    with open(TEST_REPO_PATH / TARGET_FILE, "a") as f:
+        f.write("\nFourth change")
+    run_command("git add .", cwd=TEST_REPO_PATH)
+    run_command('git commit -m "Fourth commit"', cwd=TEST_REPO_PATH)
+    records = list(iter_cached_commit_files(TEST_REPO_PATH, TARGET_FILE))
+    assert len(records) == 4, "Новый коммит должен попасть в кэш"
+    assert records == list(iter_commit_files(TEST_REPO_PATH, TARGET_FILE)), "Кэш должен совпадать с git log"
+    assert sorted(records[0][2]) == ["other_file.txt", TARGET_FILE], "В кэше должны быть все файлы коммита"
+
+    # Повреждённый кэш не должен прерывать работу: история читается через git log
+    cache_path = TEST_REPO_PATH / ".git" / "dependency_visualizer.sqlite"
+    with open(cache_path, "wb") as f:
+        f.write(b"not a database" * 100)
+    assert list(iter_cached_commit_files(TEST_REPO_PATH, TARGET_FILE)) == records, \
+        "При недоступном кэше должны возвращаться записи git log"
+    cache_path.unlink()
+    print("✅ Passed")
+
+def test_native_commit_files():
+    """Тест для iter_native_commit_files: loose-объекты и pack-файл после git gc."""
+    print("Running test_native_commit_files...")
+    expected = list(iter_commit_files(TEST_REPO_PATH, TARGET_FILE))
+    assert list(iter_native_commit_files(TEST_REPO_PATH, TARGET_FILE)) == expected, "Loose-объекты должны читаться как git log"
+    run_command("git gc --quiet", cwd=TEST_REPO_PATH)
+    assert list(iter_native_commit_files(TEST_REPO_PATH, TARGET_FILE)) == expected, "Pack-файл должен читаться как git log"
+    assert list(iter_native_commit_files(TEST_REPO_PATH, TARGET_FILE, jobs=2)) == expected, \
+        "Пул процессов должен сохранять порядок коммитов"
+    assert list(iter_native_commit_files(TEST_REPO_PATH, ".")) == list(iter_commit_files(TEST_REPO_PATH, ".")), \
+        "История всего репозитория должна совпадать с git log"
+
+    # Объекты и общие ссылки рабочего дерева лежат в commondir, клона --shared - в alternates
+    try:
+        run_command(f"git worktree add -q --detach ../{WORKTREE_PATH}", cwd=TEST_REPO_PATH)
+        run_command(f"git clone -q --shared {TEST_REPO_PATH} {SHARED_CLONE_PATH}")
+        for path in (WORKTREE_PATH, SHARED_CLONE_PATH):
+            assert list(iter_native_commit_files(path, TARGET_FILE)) == expected, \
+                f"Чтение объектов в {path} должно совпадать с git log"
+    finally:
+        run_command(f"rm -rf {WORKTREE_PATH} {SHARED_CLONE_PATH}")
+        run_command("git worktree prune", cwd=TEST_REPO_PATH)
+
+    repository = GitRepository(TEST_REPO_PATH)
+    try:
+        list(repository.iter_commit_files(TARGET_FILE, head="refs/heads/missing"))
+        assert False, "Неразрешимая ссылка должна приводить к ошибке"
+    except ValueError:
+        pass
+    finally:
+        repository.close()
+    print("✅ Passed")
+
+def test_empty_root_commit():
+    """Последняя запись git log -z без файлов (пустой корневой коммит) не теряется."""
+    print("Running test_empty_root_commit...")
+    stream = io.BytesIO(b"\x01b 2 a\nf\0\0\x01a 1 ")
+    assert list(iter_log_records(stream)) == [("b 2 a", ["f"]), ("a 1 ", [])], \
+        "Заголовок в конце потока должен разбираться как коммит, а не как файл"
+
+    if EMPTY_ROOT_REPO_PATH.exists():
+        run_command(f"rm -rf {EMPTY_ROOT_REPO_PATH}")
+    EMPTY_ROOT_REPO_PATH.mkdir()
+    try:
+        run_command("git init -q", cwd=EMPTY_ROOT_REPO_PATH)
+        run_command('git commit -q --allow-empty -m "Empty root"', cwd=EMPTY_ROOT_REPO_PATH)
+        with open(EMPTY_ROOT_REPO_PATH / TARGET_FILE, "w") as f:
+            f.write("Content")
+        run_command("git add .", cwd=EMPTY_ROOT_REPO_PATH)
+        run_command('git commit -q -m "Add file"', cwd=EMPTY_ROOT_REPO_PATH)
+
+        records = list(iter_git_log(EMPTY_ROOT_REPO_PATH, "%H %P", []))
+        assert len(records) == 2, "Пустой корневой коммит должен попасть в историю"
+        (commit, child_files), (root, root_files) = records
+        commit = commit.split()[0]
+        assert child_files == [TARGET_FILE] and root_files == [], "Заголовок не должен попадать в файлы коммита"
+        assert list(iter_native_commit_files(EMPTY_ROOT_REPO_PATH, ".")) == \
+            list(iter_commit_files(EMPTY_ROOT_REPO_PATH, ".")), "Пустой корневой коммит не меняет путь \".\""
+        # Последняя пара без изменений тоже даёт запись
+        assert list(iter_merge_diffs(EMPTY_ROOT_REPO_PATH, [(commit, [root, commit])])) == \
+            [(commit, 0, [TARGET_FILE]), (commit, 1, [])], "Пара без изменений в конце вывода не должна теряться"
+    finally:
+        run_command(f"rm -rf {EMPTY_ROOT_REPO_PATH}")
+    print("✅ Passed")
+
+def test_merge_graph():
+    """Тест графа по родителям: слияние двух веток, изменявших файл, даёт два ребра."""
+    print("Running test_merge_graph...")
+    file_path = TEST_REPO_PATH / TARGET_FILE
+    run_command("git checkout -q -b side", cwd=TEST_REPO_PATH)
+    with open(file_path) as f:
+        content = f.read()
+    with open(file_path, "w") as f:
+        f.write("Side change\n" + content)
+    run_command('git commit -q -am "Side commit"', cwd=TEST_REPO_PATH)
+    run_command("git checkout -q -", cwd=TEST_REPO_PATH)
+    with open(file_path, "a") as f:
+        f.write("\nMain change")
+    run_command('git commit -q -am "Main commit"', cwd=TEST_REPO_PATH)
+    run_command('git merge -q --no-edit side', cwd=TEST_REPO_PATH)
+
+    records = list(iter_commit_files(TEST_REPO_PATH, TARGET_FILE))
+    assert list(iter_native_commit_files(TEST_REPO_PATH, TARGET_FILE)) == records, "Чтение объектов должно совпадать с git log"
+    assert list(iter_cached_commit_files(TEST_REPO_PATH, TARGET_FILE)) == records, "Кэш должен совпадать с git log"
+    graph = build_commit_graph(records)
+    merge = graph.ids[records[0][0]]
+    assert [target for source, target in graph.edges() if source == merge] == \
+        [graph.ids[parent] for parent in records[0][1]], "Рёбра должны вести к обоим родителям слияния"
+    assert len(records[0][1]) == 2, "У слияния должно быть два родителя"
+    assert len(list(graph.edges())) == len(records), "Ветвление добавляет одно ребро сверх цепочки"
+    print("✅ Passed")
+
+def test_write_graph_formats():
+    """Тест для write_graph: Mermaid, DOT и JSON Lines из одних записей."""
+    print("Running test_write_graph_formats...")
+    records = list(iter_commit_files(TEST_REPO_PATH, TARGET_FILE))
+    outputs = {}
+    for graph_format in ("mermaid", "dot", "jsonl"):
+        outputs[graph_format] = io.StringIO()
+        assert write_graph(iter(records), outputs[graph_format], graph_format) == len(records), "Должны быть записаны все коммиты"
+    assert outputs["mermaid"].getvalue().rstrip("\n") == build_mermaid_graph(TEST_REPO_PATH, TARGET_FILE), \
+        "Потоковая запись Mermaid должна совпадать с build_mermaid_graph"
+    commit, parents = records[0][:2]
+    assert f"{commit}[\"{commit[:7]}: " in outputs["mermaid"].getvalue() and \
+        f"{commit} --> {parents[0]}" in outputs["mermaid"].getvalue(), "Узел Mermaid должен называться полным хэшем"
+    # Коммиты с общим 7-символьным префиксом остаются разными узлами
+    output = io.StringIO()
+    write_graph([("abcdef01", ("abcdef02",), ["a"], 0), ("abcdef02", (), ["a"], 0)], output, "dot")
+    assert '"abcdef01" -> "abcdef02"' in output.getvalue(), "Ребро DOT не должно склеивать коммиты с общим префиксом"
+    dot = outputs["dot"].getvalue()
+    assert dot.startswith("digraph") and dot.rstrip().endswith("}"), "DOT должен содержать digraph { ... }"
+    assert dot.count(" -> ") == sum(len(parents) for _, parents, _, _ in records), "В DOT должны быть все рёбра"
+    lines = [json.loads(line) for line in outputs["jsonl"].getvalue().splitlines()]
+    assert [(line["commit"], tuple(line["parents"]), line["files"]) for line in lines] == \
+        [record[:3] for record in records], \
+        "JSON Lines должен содержать записи коммитов"
+    print("✅ Passed")
+
+def test_cochange_index():
+    """Тест для build_cochange_index: несколько файлов за один проход истории."""
+    print("Running test_cochange_index...")
+    files = [TARGET_FILE, "other_file.txt"]
+    index = build_cochange_index(iter_commit_files(TEST_REPO_PATH, files), files)
+    assert index.commits_of(TARGET_FILE) == get_git_commits_with_file(TEST_REPO_PATH, TARGET_FILE), \
+        "Обратный индекс должен содержать все коммиты файла"
+    assert index.cochanged(TARGET_FILE) == {"other_file.txt": 1}, "Файлы менялись вместе в одном коммите"
+    assert [(index.paths[a], index.paths[b], weight) for a, b, weight in index.iter_edges()] in (
+        [(TARGET_FILE, "other_file.txt", 1)], [("other_file.txt", TARGET_FILE, 1)]), "Ребро должно быть одно"
+    assert list(build_cochange_index(iter_commit_files(TEST_REPO_PATH, "."), ".", max_files=1).iter_edges()) == [], \
+        "Коммиты с числом файлов больше max_files не учитываются"
+    print("✅ Passed")
+
+def test_reduce_graph():
+    """Тест для reduce_graph: объединение цепочек, агрегация по времени и выборка узлов."""
+    print("Running test_reduce_graph...")
+    records = [
+        ("c4", ("c3",), ["a", "b", "c"], 4 * 86400),
+        ("c3", ("c2",), ["a"], 3 * 86400),
+        ("c2", ("c1",), ["a"], 3 * 86400 + 60),
+        ("c1", (), ["a"], 86400),
+    ]
+    graph = build_commit_graph(records)
+    reduced, titles = reduce_graph(graph, coalesce=True)
+    assert [(commit, parents) for commit, parents, _, _ in reduced] == [("c4", ("c3",)), ("c3", ())], \
+        "Цепочка коммитов с одинаковыми файлами должна стать одним узлом"
+    assert titles == {"c3": "c3..c1 (коммитов: 3)"}, "Подпись группы должна содержать диапазон и число коммитов"
+
+    reduced, titles = reduce_graph(graph, bucket="day")
+    assert [(commit, parents) for commit, parents, _, _ in reduced] == [("c4", ("c3",)), ("c3", ("c1",)), ("c1", ())], \
+        "Коммиты одного дня должны объединяться"
+    assert titles["c3"] == "1970-01-04 (коммитов: 2)", "Подпись интервала должна содержать дату"
+
+    reduced, _ = reduce_graph(graph, max_nodes=2)
+    assert [(commit, parents) for commit, parents, _, _ in reduced] == [("c4", ("c1",)), ("c1", ())], \
+        "Выборка должна переписывать рёбра на оставшихся предков"
+
+    # Время коммиттера идёт не по порядку родителей: c2 моложе своего потомка c3
+    skewed = build_commit_graph([
+        ("c4", ("c3",), ["a"], 4 * 86400),
+        ("c3", ("c2",), ["a"], 2 * 86400),
+        ("c2", ("c1",), ["a"], 3 * 86400),
+        ("c1", (), ["a"], 2 * 86400 + 60),
+    ])
+    reduced, _ = reduce_graph(skewed, bucket="day")
+    assert [(commit, parents) for commit, parents, _, _ in reduced] == [("c4", ("c3",)), ("c3", ()), ("c2", ("c3",))], \
+        "Рёбра интервалов должны вести только к более ранним интервалам"
+    reduced, _ = reduce_graph(skewed, bucket="day", max_nodes=2)
+    assert [commit for commit, _, _, _ in reduced] == ["c4", "c2"], "Выборка по интервалам должна завершаться"
+    nearest = NearestShown({"a": ("b",), "b": ("c",), "c": ("b", "d")}, {"d"})
+    assert nearest.rewrite(("a",)) == ("d",), "Цикл среди скрытых коммитов не должен зацикливать обход"
+
+    output = io.StringIO()
+    write_graph(records[:1], output, max_label_files=1)
+    assert "c4: a<br>... и ещё 2" in output.getvalue(), "Подпись должна ограничиваться max_label_files файлами"
+    print("✅ Passed")
+
+def test_update_graph():
+    """Тест для update_graph: дописываются только новые коммиты, результат совпадает с полным построением."""
+    print("Running test_update_graph...")
+    output_path = TEST_REPO_PATH / "graph.dot"
+    count, appended = update_graph(TEST_REPO_PATH, TARGET_FILE, output_path, "dot")
+    assert not appended and count == len(list(iter_commit_files(TEST_REPO_PATH, TARGET_FILE))), \
+        "Первый запуск должен строить граф целиком"
+    count, appended = update_graph(TEST_REPO_PATH, TARGET_FILE, output_path, "dot")
+    assert appended and count == 0, "Без новых коммитов граф не должен меняться"
+
+    with open(TEST_REPO_PATH / TARGET_FILE, "a") as f:
+        f.write("\nUpdate change")
+    run_command('git commit -q -am "Update commit"', cwd=TEST_REPO_PATH)
+    count, appended = update_graph(TEST_REPO_PATH, TARGET_FILE, output_path, "dot")
+    assert appended and count == 1, "Должен быть дописан только новый коммит"
+
+    full = io.StringIO()
+    write_graph(iter_commit_files(TEST_REPO_PATH, TARGET_FILE), full, "dot")
+    with open(output_path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert lines[-1] == "}" and sorted(lines) == sorted(full.getvalue().splitlines()), \
+        "Дополненный граф должен содержать те же узлы и рёбра, что и построенный заново"
+    print("✅ Passed")
+
 def test_save_graph_to_file():
     """Тест для save_graph_to_file."""
     print("Running test_save_graph_to_file...")
@@ -98,7 +354,16 @@ def main():
         # Запуск тестов
         test_get_git_commits_with_file()
         test_get_commit_files()
+        test_iter_commit_files()
         test_build_mermaid_graph()
+        test_cached_commit_files()
+        test_native_commit_files()
+        test_empty_root_commit()
+        test_merge_graph()
+        test_write_graph_formats()
+        test_cochange_index()
+        test_reduce_graph()
+        test_update_graph()
         test_save_graph_to_file()
 
         print("✅ Все тесты прошли успешно!")
@@ -0,0 +1,95 @@
+import sys
+import json
+import time
+import argparse
+import platform
+from config_language import compile_expression, eval_expression, process_yaml
+
+def legacy_eval_expression(expr, constants):
+    """
+    Прежняя реализация: подстановка всех констант через str.replace и eval.
+    Оставлена только для сравнения скорости.
+    """
+    for name, value in constants.items():
+        expr = expr.replace(name, str(value))
+    expr = expr.replace('mod', '%')
+    return eval(expr)
+
+def make_config(constants, expressions):
+    """
+    Синтетический конфиг: constants числовых констант и expressions выражений,
+    каждое из которых ссылается на три константы.
+    """
+    config = {f"c{i:06d}": i for i in range(constants)}
+    for i in range(expressions):
+        a, b, c = i % constants, (i * 7 + 1) % constants, (i * 13 + 2) % constants
+        config[f"e{i:06d}"] = f"?[(c{a:06d} + c{b:06d}) * 2 - c{c:06d} mod 7]"
+    return config
+
+def throughput(func, items, budget):
+    """
+    Число вызовов func в секунду на элементах items; замер прекращается,
+    когда израсходован бюджет времени budget секунд.
+    """
+    done = 0
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+        done += 1
+        if time.perf_counter() - start > budget:
+            break
+    return done / (time.perf_counter() - start)
+
+def run_case(constants, expressions, budget):
+    config = make_config(constants, expressions)
+    names = {name: value for name, value in config.items() if isinstance(value, int)}
+    sources = [value[2:-1] for value in config.values() if isinstance(value, str)]
+
+    compile_expression.cache_clear()
+    cold = throughput(lambda expr: eval_expression(expr, names), sources, budget)
+    warm = throughput(lambda expr: eval_expression(expr, names), sources, budget)
+    legacy = throughput(lambda expr: legacy_eval_expression(expr, names), sources, budget)
+
+    start = time.perf_counter()
+    process_yaml(config)
+    translate = time.perf_counter() - start
+    return {
+        'constants': constants,
+        'expressions': expressions,
+        'compiled_cold_per_s': cold,
+        'compiled_warm_per_s': warm,
+        'legacy_per_s': legacy,
+        'process_yaml_s': translate,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк вычисления выражений ?[...] на конфигах с большим числом констант.')
+    parser.add_argument('--constants', type=int, nargs='+', default=[1000, 10000, 50000],
+                        help='Числа констант в синтетических конфигах.')
+    parser.add_argument('--expressions', type=int, default=10000, help='Число выражений в конфиге.')
+    parser.add_argument('--budget', type=float, default=2.0,
+                        help='Ограничение времени одного замера в секундах (для прежней реализации).')
+    parser.add_argument('--output', help='Файл для результатов в формате JSON (по умолчанию stdout).')
+    args = parser.parse_args()
+
+    results = []
+    for constants in args.constants:
+        result = run_case(constants, args.expressions, args.budget)
+        results.append(result)
+        print(f"{constants:>8} констант: компиляция+вычисление {result['compiled_cold_per_s']:10.0f}/с, "
+              f"из кэша {result['compiled_warm_per_s']:10.0f}/с, replace+eval {result['legacy_per_s']:8.0f}/с, "
+              f"process_yaml {result['process_yaml_s']:.3f} с", file=sys.stderr)
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,266 @@
 import yaml
 import argparse
+import ast
+import json
+import operator
+import os
 import re
 import sys
+import time
+from collections import ChainMap
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+# Лексемы языка выражений ?[...]: числа, строки в кавычках, имена и операции
+TOKEN_PATTERN = re.compile(r"""\s*(?:
+    (?P<number>(?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?)
+  | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+  | (?P<name>[a-zA-Z_][a-zA-Z0-9_]*(?:\.[a-zA-Z_][a-zA-Z0-9_]*)*)
+  | (?P<op>\*\*|//|[-+*/%(),])
+)""", re.VERBOSE)
+
+# Бинарные операции: приоритет и функция
+BINARY_OPERATORS = {
+    "+": (1, operator.add),
+    "-": (1, operator.sub),
+    "*": (2, operator.mul),
+    "/": (2, operator.truediv),
+    "//": (2, operator.floordiv),
+    "%": (2, operator.mod),
+    "mod": (2, operator.mod),
+    # Степень разбирается отдельно: правоассоциативна и сильнее унарного минуса
+    "**": (3, operator.pow),
+}
+UNARY_OPERATORS = {"-": operator.neg, "+": operator.pos}
+# Логические литералы (True/False - как в прежних выражениях на eval)
+LITERALS = {"true": True, "false": False, "True": True, "False": False}
+
+# Функции, доступные в выражениях
+FUNCTIONS = {
+    "chr": chr, "ord": ord, "abs": abs, "min": min, "max": max, "len": len,
+    "round": round, "int": int, "float": float, "str": str,
+}
+
+# Загрузчики YAML: C-версия доступна, если PyYAML собран с libyaml
+YAML_LOADERS = {"python": yaml.SafeLoader}
+if getattr(yaml, "__with_libyaml__", False):
+    YAML_LOADERS["c"] = yaml.CSafeLoader
+DEFAULT_LOADER = "c" if "c" in YAML_LOADERS else "python"
+
+# Расширения входных файлов пакетного режима и расширение результатов
+BATCH_INPUT_SUFFIXES = (".yaml", ".yml")
+BATCH_OUTPUT_SUFFIX = ".txt"
+
+# Коды инструкций скомпилированного выражения
+LOAD_CONST, LOAD_NAME, UNARY, BINARY, CALL = range(5)
+
+def tokenize(expr):
+    """Разбивает выражение на лексемы (вид, текст)."""
+    tokens = []
+    pos = 0
+    end = len(expr.rstrip())
+    while pos < end:
+        match = TOKEN_PATTERN.match(expr, pos)
+        if not match:
+            rest = expr[pos:].lstrip()
+            raise ValueError(f"Unexpected character {rest[:1]!r} at position {len(expr) - len(rest)}")
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == "name" and text in BINARY_OPERATORS:
+            kind = "op"
+        tokens.append((kind, text))
+        pos = match.end()
+    return tokens
+
+class CompiledExpression:
+    """
+    Выражение, скомпилированное в последовательность инструкций стековой
+    машины. Имена констант вынесены в таблицу names, инструкции ссылаются
+    на них по номеру, поэтому вычисление не зависит от числа констант.
+    """
+    __slots__ = ("source", "code", "names")
+
+    def __init__(self, source, code, names):
+        self.source = source
+        self.code = code
+        self.names = names
+
+    def evaluate(self, constants):
+        """Вычисляет выражение, беря значения имён из словаря constants."""
+        try:
+            values = [constants[name] for name in self.names]
+        except KeyError as e:
+            raise ValueError(f"Error evaluating expression '{self.source}': unknown name {e}")
+        stack = []
+        try:
+            for opcode, argument in self.code:
+                if opcode == LOAD_CONST:
+                    stack.append(argument)
+                elif opcode == LOAD_NAME:
+                    stack.append(values[argument])
+                elif opcode == BINARY:
+                    right = stack.pop()
+                    stack[-1] = argument(stack[-1], right)
+                elif opcode == UNARY:
+                    stack[-1] = argument(stack[-1])
+                else:
+                    function, count = argument
+                    arguments = stack[len(stack) - count:]
+                    del stack[len(stack) - count:]
+                    stack.append(function(*arguments))
+        except Exception as e:
+            raise ValueError(f"Error evaluating expression '{self.source}': {e}")
+        return stack[0]
+
+class ExpressionParser:
+    """
+    Разбор выражения методом рекурсивного спуска с генерацией инструкций.
+    Грамматика:
+        expr    := term (("+" | "-") term)*
+        term    := unary (("*" | "/" | "//" | "%" | "mod") unary)*
+        unary   := ("-" | "+") unary | power
+        power   := primary ["**" unary]
+        primary := number | string | "true" | "false" | name | name "(" [expr ("," expr)*] ")" | "(" expr ")"
+    Операции над константами сворачиваются при компиляции.
+    """
+    def __init__(self, source):
+        self.source = source
+        self.tokens = tokenize(source)
+        self.pos = 0
+        self.code = []
+        self.names = {}
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def advance(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def expect(self, text):
+        kind, value = self.advance()
+        if value != text:
+            raise ValueError(f"Expected {text!r}, got {value!r}" if value else f"Expected {text!r}")
+
+    def emit(self, opcode, argument, operands=0):
+        """Добавляет инструкцию; если все операнды - константы, вычисляет её сразу."""
+        if operands and len(self.code) >= operands and all(op == LOAD_CONST for op, _ in self.code[-operands:]):
+            values = [value for _, value in self.code[-operands:]]
+            try:
+                if opcode == CALL:
+                    result = argument[0](*values)
+                else:
+                    result = argument(*values)
+            except Exception:
+                # Ошибка будет сообщена при вычислении, как и у выражений с именами
+                pass
+            else:
+                del self.code[-operands:]
+                self.code.append((LOAD_CONST, result))
+                return
+        self.code.append((opcode, argument))
+
+    def parse(self):
+        self.parse_expr()
+        if self.pos < len(self.tokens):
+            raise ValueError(f"Unexpected token {self.peek()[1]!r}")
+        return CompiledExpression(self.source, tuple(self.code), tuple(self.names))
+
+    def parse_binary(self, precedence):
+        if precedence > 2:
+            self.parse_unary()
+            return
+        self.parse_binary(precedence + 1)
+        while True:
+            kind, value = self.peek()
+            if kind != "op" or value not in BINARY_OPERATORS or BINARY_OPERATORS[value][0] != precedence:
+                return
+            self.advance()
+            self.parse_binary(precedence + 1)
+            self.emit(BINARY, BINARY_OPERATORS[value][1], 2)
+
+    def parse_expr(self):
+        self.parse_binary(1)
+
+    def parse_unary(self):
+        kind, value = self.peek()
+        if kind == "op" and value in UNARY_OPERATORS:
+            self.advance()
+            self.parse_unary()
+            self.emit(UNARY, UNARY_OPERATORS[value], 1)
+        else:
+            self.parse_power()
+
+    def parse_power(self):
+        self.parse_primary()
+        if self.peek() == ("op", "**"):
+            self.advance()
+            self.parse_unary()
+            self.emit(BINARY, BINARY_OPERATORS["**"][1], 2)
+
+    def parse_primary(self):
+        kind, value = self.advance()
+        if kind == "number":
+            number = float(value) if any(c in value for c in ".eE") else int(value)
+            self.code.append((LOAD_CONST, number))
+        elif kind == "string":
+            self.code.append((LOAD_CONST, ast.literal_eval(value)))
+        elif kind == "name" and self.peek()[1] == "(":
+            if value not in FUNCTIONS:
+                raise ValueError(f"Unknown function '{value}'")
+            self.advance()
+            count = 0
+            if self.peek()[1] != ")":
+                self.parse_expr()
+                count = 1
+                while self.peek()[1] == ",":
+                    self.advance()
+                    self.parse_expr()
+                    count += 1
+            self.expect(")")
+            self.emit(CALL, (FUNCTIONS[value], count), count)
+        elif kind == "name" and value in LITERALS:
+            self.code.append((LOAD_CONST, LITERALS[value]))
+        elif kind == "name":
+            self.code.append((LOAD_NAME, self.names.setdefault(value, len(self.names))))
+        elif value == "(":
+            self.parse_expr()
+            self.expect(")")
+        else:
+            raise ValueError(f"Unexpected token {value!r}" if value else "Unexpected end of expression")
+
+@lru_cache(maxsize=1 << 16)
+def compile_expression(expr):
+    """Компилирует выражение один раз; повторные выражения берутся из кэша."""
+    try:
+        return ExpressionParser(expr).parse()
+    except ValueError as e:
+        raise ValueError(f"Error parsing expression '{expr}': {e}")
 
 # Поддержка операций для вычисления константных выражений
 def eval_expression(expr, constants):
-    """Вычисление константного выражения."""
-    # Заменяем имена на соответствующие значения констант
-    for name, value in constants.items():
-        expr = expr.replace(name, str(value))
-    
-    # Заменяем операции и функции на аналоги Python
-    expr = expr.replace('mod', '%').replace('chr', 'chr')
-    
-    try:
-        # Возвращаем результат выполнения выражения
-        return eval(expr)
-    except Exception as e:
-        raise ValueError(f"Error evaluating expression '{expr}': {e}")
+    """Вычисление константного выражения без eval: имена ищутся в словаре констант."""
+    return compile_expression(expr).evaluate(constants)
 
 def parse_arguments():
     """Парсинг аргументов командной строки."""
     parser = argparse.ArgumentParser(description="YAML to UCL Translator")
-    parser.add_argument("input", help="Path to input YAML file")
-    parser.add_argument("output", help="Path to output UCL file")
+    parser.add_argument("input", help="Path to input YAML file (with --batch: directory or manifest file)")
+    parser.add_argument("output", help="Path to output UCL file (with --batch: output directory)")
+    parser.add_argument("--loader", choices=list(YAML_LOADERS), default=DEFAULT_LOADER,
+                        help="YAML loader (default: libyaml-based 'c' when available)")
+    parser.add_argument("--two-phase", action="store_true",
+                        help="Resolve constants in dependency order (forward references, scoped names); "
+                             "loads the whole document instead of streaming")
+    parser.add_argument("--prelude", help="YAML file with shared constants available to every input")
+    parser.add_argument("--batch", action="store_true",
+                        help="Translate all YAML files of a directory or manifest in parallel")
+    parser.add_argument("--jobs", type=int, help="Worker processes in batch mode (default: CPU count)")
+    parser.add_argument("--report", help="Write per-file timings and errors of batch mode to a JSON file")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Compare parse, transform and write phases across available loaders")
+    parser.add_argument("--repeats", type=int, default=3, help="Repetitions per phase in benchmark mode")
     return parser.parse_args()
 
 def validate_name(name):
@@ -44,8 +281,12 @@ def validate_value(value):
     else:
         raise ValueError(f"Unsupported value type: {type(value)}")
 
-def process_item(key, value, constants, indent=0):
-    """Обрабатывает отдельный элемент, поддерживает вложенность и комментарии."""
+def process_item(key, value, constants, indent=0, resolved=None, scope=()):
+    """
+    Обрабатывает отдельный элемент, поддерживает вложенность и комментарии.
+    Если передан resolved (результат resolve_constants), значения выражений
+    берутся из него по полному имени с учётом области scope.
+    """
     validate_name(key)
     indent_space = "  " * indent
     result = []
@@ -54,7 +295,7 @@ def process_item(key, value, constants, indent=0):
         # Если значение — словарь, обрабатываем его как блок
         result.append(f"{indent_space}{key} {{")
         for subkey, subvalue in value.items():
-            result.extend(process_item(subkey, subvalue, constants, indent + 1))
+            result.extend(process_item(subkey, subvalue, constants, indent + 1, resolved, scope + (key,)))
         result.append(f"{indent_space}}}")
     elif isinstance(value, list):
         # Если значение — массив
@@ -63,8 +304,12 @@ def process_item(key, value, constants, indent=0):
     elif isinstance(value, str) and value.startswith('?[') and value.endswith(']'):
         # Если значение — выражение
         expression = value[2:-1]  # Убираем "?[" и "]"
-        evaluated_value = eval_expression(expression, constants)
-        result.append(f"{indent_space}{key} is {evaluated_value}")
+        if resolved is None:
+            evaluated_value = eval_expression(expression, constants)
+        else:
+            evaluated_value = resolved[qualified_name(scope, key)]
+        shown = validate_value(evaluated_value) if isinstance(evaluated_value, bool) else evaluated_value
+        result.append(f"{indent_space}{key} is {shown}")
         constants[key] = evaluated_value
     elif isinstance(value, str) and value.startswith('*'):
         # Однострочный комментарий
@@ -83,21 +328,123 @@ def process_item(key, value, constants, indent=0):
 
     return result
 
-def process_yaml(yaml_data, indent=0):
-    """Преобразует YAML в UCL с поддержкой вложенности и комментариев."""
+def qualified_name(scope, key):
+    """Полное имя константы во вложенном блоке: имена блоков через точку."""
+    return ".".join((*scope, key))
+
+def collect_definitions(yaml_data, scope=(), definitions=None):
+    """
+    Первая фаза: собирает определения констант всего документа
+    {полное имя: (область, значение)}; выражения компилируются.
+    Списки и комментарии, как и в process_item, константами не являются.
+    """
+    if definitions is None:
+        definitions = {}
+    for key, value in yaml_data.items():
+        validate_name(key)
+        if isinstance(value, dict):
+            collect_definitions(value, scope + (key,), definitions)
+        elif isinstance(value, list):
+            continue
+        elif isinstance(value, str) and value.startswith('?[') and value.endswith(']'):
+            definitions[qualified_name(scope, key)] = (scope, compile_expression(value[2:-1]))
+        elif isinstance(value, str) and (value.startswith('*') or value.startswith('#|') and value.endswith('|#')):
+            continue
+        else:
+            definitions[qualified_name(scope, key)] = (scope, value)
+    return definitions
+
+def resolve_reference(name, scope, definitions, owner):
+    """
+    Полное имя константы, на которую ссылается name из области scope:
+    поиск идёт от текущего блока к корню, само определение owner пропускается.
+    Имя может быть полным (server.port).
+    """
+    for depth in range(len(scope), -1, -1):
+        candidate = qualified_name(scope[:depth], name)
+        if candidate != owner and candidate in definitions:
+            return candidate
+    raise ValueError(f"Error evaluating expression for '{owner}': unknown name '{name}'")
+
+def topological_order(dependencies):
+    """
+    Порядок вычисления выражений: каждое после всех, от которых зависит.
+    dependencies - {имя: имена зависимостей}; имена без записи считаются
+    готовыми значениями. При цикле - ValueError с путём цикла.
+    """
+    order = []
+    state = {}  # 1 - в обработке, 2 - вычислено
+    for root in dependencies:
+        if root in state:
+            continue
+        state[root] = 1
+        stack = [(root, iter(dependencies[root]))]
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                if child not in dependencies or state.get(child) == 2:
+                    continue
+                if state.get(child) == 1:
+                    path = [name for name, _ in stack]
+                    cycle = path[path.index(child):] + [child]
+                    raise ValueError(f"Cyclic dependency between constants: {' -> '.join(cycle)}")
+                state[child] = 1
+                stack.append((child, iter(dependencies[child])))
+                break
+            else:
+                state[node] = 2
+                order.append(node)
+                stack.pop()
+    return order
+
+def resolve_constants(yaml_data, prelude=None):
+    """
+    Двухфазное вычисление констант: собрать все определения с полными
+    именами, построить граф зависимостей выражений, проверить его на циклы
+    и вычислить выражения в топологическом порядке. Ссылки вперёд
+    разрешены. Выражение с теми же зависимостями (например, в блоке,
+    повторённом через якорь YAML) вычисляется один раз. Константы
+    прелюдии prelude доступны как определения корневого блока.
+    Возвращает {полное имя: значение}.
+    """
+    definitions = {name: ((), value) for name, value in (prelude or {}).items()}
+    collect_definitions(yaml_data, definitions=definitions)
+    dependencies = {}
+    for name, (scope, value) in definitions.items():
+        if isinstance(value, CompiledExpression):
+            dependencies[name] = tuple(resolve_reference(reference, scope, definitions, name)
+                                       for reference in value.names)
+    values = {name: value for name, (_, value) in definitions.items() if name not in dependencies}
+    memo = {}
+    for name in topological_order(dependencies):
+        expression = definitions[name][1]
+        key = (expression, dependencies[name])
+        if key not in memo:
+            memo[key] = expression.evaluate(dict(zip(expression.names, map(values.__getitem__, dependencies[name]))))
+        values[name] = memo[key]
+    return values
+
+def process_yaml(yaml_data, indent=0, two_phase=False, prelude=None):
+    """
+    Преобразует YAML в UCL с поддержкой вложенности и комментариев.
+    С two_phase константы вычисляются заранее в порядке зависимостей
+    (resolve_constants), иначе - по порядку документа. prelude - общие
+    константы (load_prelude), доступные в выражениях.
+    """
     if not isinstance(yaml_data, dict):
         raise ValueError("Root of YAML file must be a dictionary.")
-    constants = {}
+    resolved = resolve_constants(yaml_data, prelude) if two_phase else None
+    constants = ChainMap({}, prelude or {})
     result = []
     for key, value in yaml_data.items():
-        result.extend(process_item(key, value, constants, indent))
+        result.extend(process_item(key, value, constants, indent, resolved))
     return result
 
-def read_yaml(input_path):
-    """Считывает YAML файл."""
+def read_yaml(input_path, loader=DEFAULT_LOADER):
+    """Считывает YAML файл; по умолчанию C-загрузчиком, если он доступен."""
     with open(input_path, "r", encoding="utf-8") as file:
         try:
-            return yaml.safe_load(file)
+            return yaml.load(file, Loader=YAML_LOADERS[loader])
         except yaml.YAMLError as e:
             raise ValueError(f"Error parsing YAML: {e}")
 
@@ -106,30 +453,361 @@ def write_ucl(output_path, ucl_lines):
     with open(output_path, "w", encoding="utf-8") as file:
         file.write("\n".join(ucl_lines))
 
-def main():
-    """Главная функция."""
-    args = parse_arguments()
+class YamlEventReader:
+    """
+    Поток событий парсера YAML с раскрытием ссылок (*имя): события узла
+    с якорем (&имя) запоминаются и воспроизводятся вместо ссылки. Ошибки
+    разбора превращаются в ValueError.
+    """
+    def __init__(self, events):
+        self.events = iter(events)
+        self.pending = []
+        self.anchors = {}
+        self.recording = []
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.pending:
+            event = self.pending.pop()
+        else:
+            try:
+                event = next(self.events)
+            except yaml.YAMLError as e:
+                raise ValueError(f"Error parsing YAML: {e}")
+        if isinstance(event, yaml.AliasEvent):
+            if event.anchor not in self.anchors:
+                raise ValueError(f"Error parsing YAML: found undefined alias '{event.anchor}'")
+            self.pending.extend(reversed(self.anchors[event.anchor]))
+            return next(self)
+        if isinstance(event, (yaml.ScalarEvent, yaml.CollectionStartEvent)) and event.anchor:
+            self.recording.append([event.anchor, [], 0])
+        for recorder in self.recording:
+            recorder[1].append(event)
+            if isinstance(event, yaml.CollectionStartEvent):
+                recorder[2] += 1
+            elif isinstance(event, yaml.CollectionEndEvent):
+                recorder[2] -= 1
+            if recorder[2] == 0:
+                self.anchors[recorder[0]] = recorder[1]
+        self.recording = [recorder for recorder in self.recording if recorder[2] > 0]
+        return event
 
-    # Чтение и обработка YAML
+    def expect(self, event_type):
+        event = next(self)
+        if not isinstance(event, event_type):
+            raise ValueError(f"Error parsing YAML: unexpected {type(event).__name__}")
+        return event
+
+SCALAR_RESOLVER = yaml.resolver.Resolver()
+SCALAR_CONSTRUCTOR = yaml.constructor.SafeConstructor()
+
+def construct_scalar(event):
+    """Значение скаляра с теми же типами, что дал бы yaml.safe_load."""
+    tag = event.tag
+    if tag is None or tag == "!":
+        tag = SCALAR_RESOLVER.resolve(yaml.ScalarNode, event.value, event.implicit)
+    node = yaml.ScalarNode(tag, event.value, event.start_mark, event.end_mark, event.style)
+    construct = SCALAR_CONSTRUCTOR.yaml_constructors.get(tag, SCALAR_CONSTRUCTOR.yaml_constructors[None])
+    try:
+        return construct(SCALAR_CONSTRUCTOR, node)
+    except yaml.YAMLError as e:
+        raise ValueError(f"Error parsing YAML: {e}")
+
+def construct_value(reader, event):
+    """Собирает значение узла, начинающегося с event (скаляр, список или словарь)."""
+    if isinstance(event, yaml.ScalarEvent):
+        return construct_scalar(event)
+    if isinstance(event, yaml.SequenceStartEvent):
+        items = []
+        for event in reader:
+            if isinstance(event, yaml.SequenceEndEvent):
+                return items
+            items.append(construct_value(reader, event))
+    if isinstance(event, yaml.MappingStartEvent):
+        mapping = {}
+        for event in reader:
+            if isinstance(event, yaml.MappingEndEvent):
+                return mapping
+            key = construct_value(reader, event)
+            mapping[key] = construct_value(reader, next(reader))
+    raise ValueError(f"Error parsing YAML: unexpected {type(event).__name__}")
+
+class StreamingUnsupported(Exception):
+    """Документ нельзя перевести потоково: нужен разбор целиком (process_yaml)."""
+
+def is_merge_key(event):
+    """Ключ слияния YAML (<<: *якорь)."""
+    if not isinstance(event, yaml.ScalarEvent):
+        return False
+    tag = event.tag
+    if tag is None or tag == "!":
+        tag = SCALAR_RESOLVER.resolve(yaml.ScalarNode, event.value, event.implicit)
+    return tag == "tag:yaml.org,2002:merge"
+
+def process_yaml_events(events, indent=0, prelude=None):
+    """
+    Потоковое преобразование YAML в UCL по событиям парсера: строки UCL
+    отдаются по мере разбора. Словари не собираются в памяти - открытые
+    блоки хранятся в стеке, поэтому память зависит от глубины вложенности,
+    а не от размера документа (целиком собираются только значения-списки,
+    таблица констант и множества ключей открытых блоков). prelude - общие
+    константы. Ключи слияния (<<) и повторяющиеся ключи меняют уже выведенные
+    строки блока, поэтому на них выбрасывается StreamingUnsupported.
+    """
+    reader = YamlEventReader(events)
+    reader.expect(yaml.StreamStartEvent)
+    event = next(reader)
+    if isinstance(event, yaml.DocumentStartEvent):
+        event = next(reader)
+    if not isinstance(event, yaml.MappingStartEvent):
+        raise ValueError("Root of YAML file must be a dictionary.")
+    constants = ChainMap({}, prelude or {})
+    blocks = []
+    block_keys = [set()]
+    for event in reader:
+        if isinstance(event, yaml.MappingEndEvent):
+            if not blocks:
+                break
+            block_keys.pop()
+            yield f"{'  ' * blocks.pop()}}}"
+            continue
+        if is_merge_key(event):
+            raise StreamingUnsupported("merge key")
+        key = construct_value(reader, event)
+        if key in block_keys[-1]:
+            raise StreamingUnsupported(f"duplicate key '{key}'")
+        block_keys[-1].add(key)
+        key_indent = indent + len(blocks)
+        event = next(reader)
+        if isinstance(event, yaml.MappingStartEvent):
+            validate_name(key)
+            yield f"{'  ' * key_indent}{key} {{"
+            blocks.append(key_indent)
+            block_keys.append(set())
+        else:
+            yield from process_item(key, construct_value(reader, event), constants, key_indent)
+    reader.expect(yaml.DocumentEndEvent)
+    if not isinstance(next(reader), yaml.StreamEndEvent):
+        raise ValueError("Error parsing YAML: expected a single document in the stream")
+
+def translate_file(input_path, output_path, loader=DEFAULT_LOADER, prelude=None):
+    """
+    Потоково переводит YAML файл в UCL: строки пишутся в файл по мере
+    разбора входа. Результат сначала пишется во временный файл рядом
+    с output_path и заменяет его только при успехе. Документы с ключами
+    слияния или повторяющимися ключами переводятся через process_yaml,
+    чтобы результат совпадал с yaml.safe_load.
+    """
+    temp_path = f"{output_path}.tmp"
+    try:
+        try:
+            with open(input_path, "r", encoding="utf-8") as source, open(temp_path, "w", encoding="utf-8") as target:
+                separator = ""
+                for line in process_yaml_events(yaml.parse(source, Loader=YAML_LOADERS[loader]), prelude=prelude):
+                    target.write(separator)
+                    target.write(line)
+                    separator = "\n"
+        except StreamingUnsupported:
+            write_ucl(temp_path, process_yaml(read_yaml(input_path, loader), prelude=prelude))
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+def translate(input_path, output_path, loader=DEFAULT_LOADER, two_phase=False, prelude=None):
+    """Переводит один файл: потоково или, с two_phase, целиком в порядке зависимостей."""
+    if two_phase:
+        # Для вычисления в порядке зависимостей нужен весь документ
+        write_ucl(output_path, process_yaml(read_yaml(input_path, loader), two_phase=True, prelude=prelude))
+    else:
+        translate_file(input_path, output_path, loader, prelude)
+
+def load_prelude(input_path, loader=DEFAULT_LOADER):
+    """
+    Вычисляет общие константы из YAML файла прелюдии (по порядку документа)
+    один раз для всего пакета. Возвращает {имя: значение}.
+    """
+    yaml_data = read_yaml(input_path, loader)
+    if not isinstance(yaml_data, dict):
+        raise ValueError("Root of prelude file must be a dictionary.")
+    constants = {}
+    for key, value in yaml_data.items():
+        process_item(key, value, constants)
+    return constants
+
+def list_batch_inputs(source):
+    """
+    Входные файлы пакета: все *.yaml и *.yml каталога source (рекурсивно)
+    или пути из файла-манифеста source, по одному в строке (относительно
+    манифеста; пустые строки и строки с # пропускаются).
+    Возвращает список (путь, путь относительно source).
+    """
+    if os.path.isdir(source):
+        inputs = []
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(BATCH_INPUT_SUFFIXES):
+                    path = os.path.join(root, name)
+                    inputs.append((path, os.path.relpath(path, source)))
+        return inputs
+    base = os.path.dirname(source)
+    with open(source, "r", encoding="utf-8") as manifest:
+        lines = [line.strip() for line in manifest]
+    return [(os.path.join(base, line), os.path.normpath(line).lstrip(os.sep))
+            for line in lines if line and not line.startswith("#")]
+
+# Настройки перевода в процессе пула, задаются один раз при его запуске
+BATCH_SETTINGS = {}
+
+def init_batch_worker(loader, two_phase, prelude):
+    BATCH_SETTINGS.update(loader=loader, two_phase=two_phase, prelude=prelude)
+
+def translate_batch_item(item):
+    """
+    Переводит один файл пакета. Возвращает (вход, результат, секунды, ошибка или None):
+    ошибки не прерывают пакет, а собираются в отчёт.
+    """
+    input_path, output_path, error = item
+    if error:
+        return input_path, output_path, 0.0, error
+    start = time.perf_counter()
     try:
-        yaml_data = read_yaml(args.input)
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        translate(input_path, output_path, **BATCH_SETTINGS)
+        error = None
     except Exception as e:
-        print(f"Error reading input file: {e}")
+        error = f"{type(e).__name__}: {e}"
+    return input_path, output_path, time.perf_counter() - start, error
+
+def translate_batch(source, output_dir, loader=DEFAULT_LOADER, two_phase=False, prelude=None, jobs=None):
+    """
+    Пакетный перевод: файлы каталога или манифеста source переводятся в
+    output_dir с сохранением относительных путей в jobs процессах.
+    prelude (результат load_prelude) передаётся каждому процессу один раз.
+    Файлы, чей результат оказался бы вне output_dir или совпал бы с
+    результатом другого файла (x.yaml и x.yml), не переводятся и попадают
+    в отчёт как ошибки. Отдаёт результаты translate_batch_item в порядке
+    входных файлов.
+    """
+    inputs = []
+    sources_of = {}
+    for path, relative in list_batch_inputs(source):
+        relative = os.path.normpath(relative)
+        output_path = os.path.join(output_dir, os.path.splitext(relative)[0] + BATCH_OUTPUT_SUFFIX)
+        inputs.append((path, relative, output_path))
+        sources_of.setdefault(output_path, []).append(path)
+    items = []
+    for path, relative, output_path in inputs:
+        error = None
+        if os.path.isabs(relative) or relative == os.pardir or relative.startswith(os.pardir + os.sep):
+            error = f"Output path escapes the output directory: {relative}"
+        elif len(sources_of[output_path]) > 1:
+            others = ", ".join(other for other in sources_of[output_path] if other != path)
+            error = f"Output path {output_path} is shared with {others}"
+        items.append((path, output_path, error))
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(items) <= 1:
+        init_batch_worker(loader, two_phase, prelude)
+        yield from map(translate_batch_item, items)
+        return
+    chunksize = max(1, len(items) // (jobs * 4))
+    with ProcessPoolExecutor(jobs, initializer=init_batch_worker, initargs=(loader, two_phase, prelude)) as executor:
+        yield from executor.map(translate_batch_item, items, chunksize=chunksize)
+
+def run_batch(args, prelude):
+    """Выполняет пакетный режим CLI: печатает время по файлам и сводку ошибок."""
+    start = time.perf_counter()
+    results = []
+    for input_path, output_path, seconds, error in translate_batch(
+            args.input, args.output, args.loader, args.two_phase, prelude, args.jobs):
+        results.append({"input": input_path, "output": output_path, "seconds": seconds, "error": error})
+        status = "ERROR" if error else "ok"
+        print(f"{status:>5} {seconds:8.3f}s {input_path}")
+    elapsed = time.perf_counter() - start
+    errors = [result for result in results if result["error"]]
+    print(f"Translated {len(results) - len(errors)} of {len(results)} files in {elapsed:.2f}s")
+    if errors:
+        print(f"{len(errors)} file(s) failed:")
+        for result in errors:
+            print(f"  {result['input']}: {result['error']}")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"seconds": elapsed, "files": results}, f, ensure_ascii=False, indent=2)
+    if errors:
         sys.exit(1)
 
-    # Преобразование в UCL
+def best_time(func, repeats):
+    """Результат func и лучшее время из repeats запусков в секундах."""
+    best = None
+    for _ in range(max(repeats, 1)):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+def benchmark_loaders(input_path, output_path, repeats=3):
+    """
+    Замеряет для каждого доступного загрузчика фазы разбора (read_yaml),
+    преобразования (process_yaml) и записи (write_ucl), а также потоковый
+    перевод translate_file целиком. Возвращает {загрузчик: {фаза: секунды}}.
+    """
+    results = {}
+    for loader in YAML_LOADERS:
+        yaml_data, parse = best_time(lambda: read_yaml(input_path, loader), repeats)
+        ucl_lines, transform = best_time(lambda: process_yaml(yaml_data), repeats)
+        _, write = best_time(lambda: write_ucl(output_path, ucl_lines), repeats)
+        _, stream = best_time(lambda: translate_file(input_path, output_path, loader), repeats)
+        results[loader] = {"parse": parse, "transform": transform, "write": write, "stream": stream}
+    return results
+
+def main():
+    """Главная функция."""
+    args = parse_arguments()
+
+    if args.benchmark:
+        try:
+            results = benchmark_loaders(args.input, args.output, args.repeats)
+        except (ValueError, OSError) as e:
+            print(f"Error running benchmark: {e}")
+            sys.exit(1)
+        print(f"{'loader':>8} {'parse, s':>10} {'transform, s':>13} {'write, s':>10} {'stream, s':>10}")
+        for loader, phases in results.items():
+            print(f"{loader:>8} {phases['parse']:10.3f} {phases['transform']:13.3f} "
+                  f"{phases['write']:10.3f} {phases['stream']:10.3f}")
+        return
+
+    prelude = None
+    if args.prelude:
+        try:
+            prelude = load_prelude(args.prelude, args.loader)
+        except (ValueError, OSError) as e:
+            print(f"Error reading prelude file: {e}")
+            sys.exit(1)
+
+    if args.batch:
+        try:
+            run_batch(args, prelude)
+        except OSError as e:
+            print(f"Error reading batch input: {e}")
+            sys.exit(1)
+        return
+
+    # Потоковое чтение YAML, преобразование и запись UCL
     try:
-        ucl_lines = process_yaml(yaml_data)
+        translate(args.input, args.output, args.loader, args.two_phase, prelude)
+        print(f"Translation completed successfully. Output saved to {args.output}")
     except ValueError as e:
         print(f"Error processing YAML: {e}")
         sys.exit(1)
-
-    # Запись в выходной файл
-    try:
-        write_ucl(args.output, ucl_lines)
-        print(f"Translation completed successfully. Output saved to {args.output}")
-    except Exception as e:
-        print(f"Error writing output file: {e}")
+    except OSError as e:
+        if e.filename == args.input:
+            print(f"Error reading input file: {e}")
+        else:
+            print(f"Error writing output file: {e}")
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -1,10 +1,13 @@
-from config_language import process_yaml
+import os
+import tempfile
+import yaml
+from config_language import YAML_LOADERS, process_yaml, translate_file, load_prelude, translate_batch
 
-def test_case(description, yaml_input, expected_ucl):
+def test_case(description, yaml_input, expected_ucl, two_phase=False):
     """Функция для выполнения одного тестового случая."""
     print(f"Running test: {description}")
     try:
-        result = process_yaml(yaml_input)
+        result = process_yaml(yaml_input, two_phase=two_phase)
         if result == expected_ucl:
             print("✅ Test passed")
         else:
@@ -16,6 +19,87 @@ def test_case(description, yaml_input, expected_ucl):
     except Exception as e:
         print(f"❌ Test raised an exception: {e}")
 
+def test_stream_case(description, yaml_text):
+    """Потоковый перевод файла (translate_file) должен совпадать с process_yaml."""
+    print(f"Running test: {description}")
+    try:
+        expected = process_yaml(yaml.safe_load(yaml_text))
+        with tempfile.TemporaryDirectory() as work_dir:
+            input_path = os.path.join(work_dir, "input.yaml")
+            output_path = os.path.join(work_dir, "output.txt")
+            with open(input_path, "w", encoding="utf-8") as f:
+                f.write(yaml_text)
+            translate_file(input_path, output_path)
+            with open(output_path, encoding="utf-8") as f:
+                result = f.read().split("\n")
+        if result == expected:
+            print("✅ Test passed")
+        else:
+            print("❌ Test failed")
+            print("Expected:")
+            print("\n".join(expected))
+            print("Got:")
+            print("\n".join(result))
+    except Exception as e:
+        print(f"❌ Test raised an exception: {e}")
+
+def test_loaders_case(description, yaml_text):
+    """Все доступные загрузчики YAML должны давать одинаковый результат."""
+    print(f"Running test: {description}")
+    try:
+        results = {name: process_yaml(yaml.load(yaml_text, Loader=loader)) for name, loader in YAML_LOADERS.items()}
+        expected = results["python"]
+        if all(result == expected for result in results.values()):
+            print(f"✅ Test passed ({', '.join(results)})")
+        else:
+            print("❌ Test failed")
+            for name, result in results.items():
+                print(f"{name}:")
+                print("\n".join(result))
+    except Exception as e:
+        print(f"❌ Test raised an exception: {e}")
+
+def test_error_case(description, yaml_input, expected_message):
+    """Проверяет, что преобразование в двухфазном режиме завершается ошибкой с ожидаемым текстом."""
+    print(f"Running test: {description}")
+    try:
+        process_yaml(yaml_input, two_phase=True)
+        print("❌ Test failed: no error raised")
+    except ValueError as e:
+        if expected_message in str(e):
+            print("✅ Test passed")
+        else:
+            print(f"❌ Test failed: unexpected error: {e}")
+
+def test_batch_case(description, files, prelude_text, expected_outputs, expected_errors, jobs=2):
+    """Пакетный перевод каталога с общей прелюдией констант в нескольких процессах."""
+    print(f"Running test: {description}")
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            source = os.path.join(work_dir, "configs")
+            output = os.path.join(work_dir, "out")
+            for name, text in files.items():
+                os.makedirs(os.path.dirname(os.path.join(source, name)), exist_ok=True)
+                with open(os.path.join(source, name), "w", encoding="utf-8") as f:
+                    f.write(text)
+            prelude_path = os.path.join(work_dir, "prelude.yaml")
+            with open(prelude_path, "w", encoding="utf-8") as f:
+                f.write(prelude_text)
+            results = list(translate_batch(source, output, prelude=load_prelude(prelude_path), jobs=jobs))
+            outputs = {}
+            for name in expected_outputs:
+                with open(os.path.join(output, name), encoding="utf-8") as f:
+                    outputs[name] = f.read().splitlines()
+            errors = sorted(os.path.relpath(input_path, source) for input_path, _, _, error in results if error)
+        if outputs == expected_outputs and errors == expected_errors:
+            print("✅ Test passed")
+        else:
+            print("❌ Test failed")
+            print(f"Expected: {expected_outputs} {expected_errors}")
+            print(f"Got: {outputs} {errors}")
+    except Exception as e:
+        print(f"❌ Test raised an exception: {e}")
+
 def run_tests():
     """Запуск всех тестов."""
     test_case(
@@ -48,6 +132,48 @@ def run_tests():
         ]
     )
 
+    test_case(
+        "Expressions with overlapping constant names",
+        {
+            "n": 2,
+            "number": 40,
+            "total": "?[number + n]",
+            "rest": "?[number mod 3]",
+            "letter": "?[chr(65 + n)]",
+            "scaled": "?[-(total - number) * 2]"
+        },
+        [
+            "n is 2",
+            "number is 40",
+            "total is 42",
+            "rest is 1",
+            "letter is C",
+            "scaled is -4"
+        ]
+    )
+
+    test_case(
+        "Power operator and boolean literals",
+        {
+            "side": 3,
+            "area": "?[side ** 2]",
+            "tower": "?[2 ** 3 ** 2]",
+            "negative": "?[-2 ** 2 * 2]",
+            "half": "?[2 ** -1]",
+            "debug": "?[true]",
+            "legacy": "?[False]"
+        },
+        [
+            "side is 3",
+            "area is 9",
+            "tower is 512",
+            "negative is -8",
+            "half is 0.5",
+            "debug is true",
+            "legacy is false"
+        ]
+    )
+
     test_case(
         "Game config",
         {
@@ -62,5 +188,87 @@ def run_tests():
         ]
     )
 
+    test_case(
+        "Two-phase resolution with forward references and scopes",
+        {
+            "total": "?[base + server.port]",
+            "server": {
+                "port": "?[base * 8]",
+                "url_port": "?[port + 1]"
+            },
+            "base": 10
+        },
+        [
+            "total is 90",
+            "server {",
+            "  port is 80",
+            "  url_port is 81",
+            "}",
+            "base is 10"
+        ],
+        two_phase=True
+    )
+
+    test_error_case(
+        "Cyclic constants are reported",
+        {"a": "?[b + 1]", "b": "?[c]", "c": "?[a * 2]"},
+        "a -> b -> c -> a"
+    )
+
+    test_stream_case(
+        "Streaming translation with nesting and anchors",
+        "base: &base\n"
+        "  host: localhost\n"
+        "  ports: [80, &tls 443]\n"
+        "n: 2\n"
+        "copy: *base\n"
+        "tls_port: *tls\n"
+        "server:\n"
+        "  limits:\n"
+        "    workers: ?[n * 4]\n"
+        "    ratio: 0.5\n"
+        "  note: \"* generated\"\n"
+        "enabled: true\n"
+    )
+
+    test_stream_case(
+        "Streaming translation with merge keys and duplicate keys",
+        "defaults: &defaults\n"
+        "  host: localhost\n"
+        "  port: 1\n"
+        "srv:\n"
+        "  <<: *defaults\n"
+        "  port: 2\n"
+        "limit: 10\n"
+        "limit: 20\n"
+    )
+
+    test_loaders_case(
+        "Same result with every YAML loader",
+        "port: 0x1F90\n"
+        "ratio: 1.5e3\n"
+        "flags: [yes, off, ~text]\n"
+        "limit: ?[port mod 1000]\n"
+        "block:\n"
+        "  name: 'quoted'\n"
+    )
+
+    test_batch_case(
+        "Batch translation with a shared prelude",
+        {
+            "web.yaml": "name: web\nport: ?[base_port + 1]\n",
+            "jobs/worker.yml": "workers: ?[base_port mod 7]\n",
+            "broken.yaml": "value: ?[missing + 1]\n",
+            "twin.yaml": "value: 1\n",
+            "twin.yml": "value: 2\n",
+        },
+        "base_port: 8000\n",
+        {
+            "web.txt": ["name is \"web\"", "port is 8001"],
+            "jobs/worker.txt": ["workers is 6"],
+        },
+        ["broken.yaml", "twin.yaml", "twin.yml"]
+    )
+
 if __name__ == "__main__":
     run_tests()